@@ -0,0 +1,117 @@
+"""
+Domain boilerplate filtering: encode work and prompt noise with and without it.
+
+Simulates browsing one site: every page is the same nav menu + cookie banner
++ body + footer, where the body has one planted fact (see context_packing)
+and a question about it. Pages are visited in order through
+rag_service.process_page_and_query, first without page_url (no filtering) and
+then with it, each against a fresh cache. Reported per mode:
+
+  ranked        chunks looked up in the embedding cache and scored
+  embedded      chunks that had to be encoded (cache misses)
+  excluded      chunks dropped as boilerplate
+  noise in top  share of retrieved sources that came from nav/banner/footer
+  tokens        mean estimated context tokens
+  fact kept     share of contexts that still contain the planted fact
+
+Without filtering, repeated boilerplate is encoded once and then served from
+the cache, so most of the saving is in ranked chunks and prompt noise rather
+than in encodes.
+
+    cd browser-assistant
+    python -m benchmarks.boilerplate --pages 30 --fake-embeddings
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+
+from benchmarks.context_packing import make_case
+from benchmarks.synthetic import _WORDS
+
+SITE = "https://www.example-news.com"
+
+
+def site_chrome(seed: int = 0) -> tuple[str, str]:
+    """(header, footer) shared by every page of the site."""
+    rng = random.Random(seed)
+    words = lambda k: " ".join(rng.choices(_WORDS, k=k))
+    nav = "\n".join(f"{w.title()}" for w in rng.sample(_WORDS, 12))
+    banner = ("We use cookies to improve your experience. " + words(30).capitalize()
+              + ". Accept all cookies or manage preferences.")
+    footer = "\n\n".join([
+        "About us\nCareers\nPress\nContact\nAdvertise\nTerms of use\nPrivacy policy",
+        "Newsletter: " + words(40).capitalize() + ".",
+        "© 2024 Example News Group. All rights reserved. " + words(50).capitalize() + ".",
+    ])
+    return f"{nav}\n\n{banner}", footer
+
+
+def run(cases, header: str, footer: str, top_k: int, budget: int, with_url: bool) -> dict:
+    import rag_service
+    from context_packer import estimate_tokens
+    from observability import BOILERPLATE_EXCLUDED, CACHE_HITS, CACHE_MISSES
+
+    rag_service.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="boilerplate_"), "rag.db")
+    hits0, misses0 = CACHE_HITS.value(cache="chunks"), CACHE_MISSES.value(cache="chunks")
+    excluded0 = BOILERPLATE_EXCLUDED.value()
+    noise, sources, tokens, kept = 0, 0, [], 0
+
+    for i, (body, question, fact) in enumerate(cases):
+        page = f"{header}\n\n{body}\n\n{footer}"
+        body_start, body_end = len(header) + 2, len(header) + 2 + len(body)
+        context, _, spans = rag_service.process_page_and_query(
+            page, question, top_k=top_k, token_budget=budget,
+            page_url=f"{SITE}/articles/{i}?utm_source=feed" if with_url else "",
+        )
+        noise += sum(end <= body_start or start >= body_end for start, end in spans)
+        sources += len(spans)
+        tokens.append(estimate_tokens(context))
+        kept += fact in context
+
+    return {
+        "mode": "page_url" if with_url else "no url",
+        "ranked": int(CACHE_HITS.value(cache="chunks") - hits0
+                      + CACHE_MISSES.value(cache="chunks") - misses0),
+        "embedded": int(CACHE_MISSES.value(cache="chunks") - misses0),
+        "excluded": int(BOILERPLATE_EXCLUDED.value() - excluded0),
+        "noise_in_top": round(noise / max(1, sources), 3),
+        "mean_tokens": round(statistics.fmean(tokens), 1),
+        "fact_retention": round(kept / len(cases), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Context with and without domain boilerplate filtering")
+    ap.add_argument("--pages", type=int, default=30)
+    ap.add_argument("--page-bytes", type=int, default=6_000)
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--budget", type=int, default=1000)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+
+    header, footer = site_chrome()
+    cases = [make_case(i, args.page_bytes) for i in range(args.pages)]
+    results = []
+    print(f"{'mode':>9} {'ranked':>7} {'embedded':>9} {'excluded':>9} {'noise in top':>13} "
+          f"{'tokens':>8} {'fact kept':>10}")
+    for with_url in (False, True):
+        row = run(cases, header, footer, args.top_k, args.budget, with_url)
+        results.append(row)
+        print(f"{row['mode']:>9} {row['ranked']:>7} {row['embedded']:>9} {row['excluded']:>9} "
+              f"{row['noise_in_top']:>13.1%} {row['mean_tokens']:>8} {row['fact_retention']:>10.0%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Diff two benchmarks.pipeline JSON reports.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Prints p50 / p99 / throughput change per (case, input) and exits non-zero if
+any p50 regressed by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _pct(old: float | None, new: float | None) -> float | None:
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _fmt(pct: float | None) -> str:
+    return "     n/a" if pct is None else f"{pct:+7.1f}%"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare two benchmark reports")
+    ap.add_argument("baseline")
+    ap.add_argument("candidate")
+    ap.add_argument("--threshold", type=float, default=10.0,
+                    help="p50 regression (percent) that fails the comparison")
+    args = ap.parse_args()
+
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        cand = json.load(f)
+
+    print(f"baseline  {base['meta'].get('revision')}  ({base['meta'].get('embeddings')})")
+    print(f"candidate {cand['meta'].get('revision')}  ({cand['meta'].get('embeddings')})\n")
+    print(f"{'case':34} {'input':>6}  {'p50':>8}  {'p99':>8}  {'thruput':>8}")
+
+    old = {(r["case"], r["input"]): r for r in base["results"]}
+    regressions = 0
+    for row in cand["results"]:
+        prev = old.get((row["case"], row["input"]))
+        if not prev:
+            print(f"{row['case']:34} {row['input']:>6}  (new)")
+            continue
+        p50 = _pct(prev["p50_ms"], row["p50_ms"])
+        print(f"{row['case']:34} {row['input']:>6}  {_fmt(p50)}  "
+              f"{_fmt(_pct(prev['p99_ms'], row['p99_ms']))}  "
+              f"{_fmt(_pct(prev['throughput'], row['throughput']))}")
+        if p50 is not None and p50 > args.threshold:
+            regressions += 1
+
+    if regressions:
+        print(f"\n{regressions} case(s) regressed by more than {args.threshold}% at p50")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Prompt size and answer retention: top-k chunks joined as-is vs
+context_packer at several token budgets.
+
+Each case is a synthetic page with one planted fact ("The warranty for
+model QX-417 lasts 37 months.") and a question about it. For every budget,
+the report shows the mean estimated context tokens and how often the
+planted fact survives into the context sent to the LLM. With --llm, each
+context also goes through llm_service.get_answer (needs GROQ_API_KEY, or
+GROQ_API_BASE pointing at benchmarks.fake_services), and LLM p50 latency
+is reported too.
+
+    cd browser-assistant
+    python -m benchmarks.context_packing --cases 40 --budgets none,1500,1000,600
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import make_page
+
+PRODUCTS = ["router", "laptop", "kettle", "camera", "monitor", "speaker", "drone", "tablet"]
+
+
+def make_case(i: int, page_bytes: int) -> tuple[str, str, str]:
+    """(page, question, fact) with the fact planted in a random paragraph."""
+    rng = random.Random(i)
+    product = rng.choice(PRODUCTS)
+    model = f"{chr(65 + rng.randint(0, 25))}{chr(65 + rng.randint(0, 25))}-{rng.randint(100, 999)}"
+    fact = f"The warranty for the {product} model {model} lasts {rng.randint(6, 60)} months."
+    paragraphs = make_page(page_bytes, seed=i).split("\n\n")
+    at = rng.randint(1, len(paragraphs) - 1)
+    paragraphs[at] = f"{paragraphs[at]} {fact}"
+    return "\n\n".join(paragraphs), f"How long is the warranty on the {product} {model}?", fact
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Unpacked vs token-budgeted /chat context")
+    ap.add_argument("--cases", type=int, default=40)
+    ap.add_argument("--page-bytes", type=int, default=30_000)
+    ap.add_argument("--budgets", default="none,1500,1000,600")
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--llm", action="store_true", help="also time llm_service.get_answer")
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+    import rag_service
+    from context_packer import estimate_tokens
+    rag_service.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="packing_"), "rag.db")
+    get_answer = None
+    if args.llm:
+        from llm_service import get_answer
+
+    cases = [make_case(i, args.page_bytes) for i in range(args.cases)]
+    results = []
+    print(f"{'budget':>7} {'tokens':>8} {'vs unpacked':>12} {'fact kept':>10} {'pipeline ms':>12}"
+          + (f" {'LLM p50 ms':>11}" if args.llm else ""))
+
+    for page, question, _ in cases:   # warm the embedding cache so budgets compare like for like
+        rag_service.process_page_and_query(page, question, top_k=args.top_k)
+
+    baseline = None
+    for label in args.budgets.split(","):
+        budget = None if label == "none" else int(label)
+        tokens, kept, pipeline_s, llm_s = [], 0, [], []
+        for page, question, fact in cases:
+            t0 = time.perf_counter()
+            context, _, _ = rag_service.process_page_and_query(
+                page, question, top_k=args.top_k, token_budget=budget)
+            pipeline_s.append(time.perf_counter() - t0)
+            tokens.append(estimate_tokens(context))
+            kept += fact in context
+            if get_answer:
+                t0 = time.perf_counter()
+                get_answer(context, question)
+                llm_s.append(time.perf_counter() - t0)
+
+        mean_tokens = statistics.fmean(tokens)
+        baseline = baseline or mean_tokens
+        row = {
+            "budget": label,
+            "mean_tokens": round(mean_tokens, 1),
+            "token_ratio": round(mean_tokens / baseline, 3),
+            "fact_retention": round(kept / len(cases), 3),
+            "pipeline_p50_ms": round(statistics.median(pipeline_s) * 1000, 1),
+        }
+        if llm_s:
+            row["llm_p50_ms"] = round(statistics.median(llm_s) * 1000, 1)
+        results.append(row)
+        print(f"{label:>7} {row['mean_tokens']:>8} {row['token_ratio']:>11.0%} "
+              f"{row['fact_retention']:>10.0%} {row['pipeline_p50_ms']:>12}"
+              + (f" {row['llm_p50_ms']:>11}" if llm_s else ""))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
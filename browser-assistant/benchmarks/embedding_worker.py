@@ -0,0 +1,189 @@
+"""
+Memory and throughput of N API workers with in-process models vs one
+shared embedding worker (embedding_service, EMBEDDING_SOCKET).
+
+Each API worker is a separate process that imports rag_service (so its
+footprint is what a uvicorn worker pays) and then encodes batches of page
+chunks for a fixed time. "local" loads the model in every API worker;
+"shared" starts `embedding_service` with --processes P and points the API
+workers at it. Reports total memory across all processes (API workers + embedding
+worker; proportional set size from /proc, so pages shared copy-on-write by
+forked processes count once; Linux only) and aggregate chunks/s.
+
+    cd browser-assistant
+    python -m benchmarks.embedding_worker --api-workers 1,2,4 --worker-processes 1,2
+    python -m benchmarks.embedding_worker --fake-embeddings --seconds 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_page
+
+BATCH = 32
+
+
+def pss_mb(pid: int) -> float:
+    """Current PSS of pid plus its child processes (forked serving processes)."""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return round(total / 1024, 1)
+
+
+# ── Child processes ───────────────────────────────────────────────────────────
+
+def run_api_worker(args):
+    """Import the backend like a uvicorn worker would, then encode until time is up."""
+    if args.fake_embeddings and not os.getenv("EMBEDDING_SOCKET"):
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+    import rag_service
+    from text_pipeline import chunk_page
+
+    texts = [c["content"] for c in chunk_page(make_page(200_000, seed=os.getpid()))]
+    rag_service.embedding_model.encode(texts[:BATCH], normalize_embeddings=True)  # warm up
+    print("ready", flush=True)
+    sys.stdin.readline()                                                          # wait for "go"
+
+    done, i = 0, 0
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        batch = texts[i:i + BATCH] or texts[:BATCH]
+        i = (i + BATCH) % len(texts)
+        rag_service.embedding_model.encode(batch, normalize_embeddings=True)
+        done += len(batch)
+    print(json.dumps({"chunks": done}), flush=True)
+    sys.stdin.readline()                                                          # hold for RSS read
+
+
+def run_embedding_worker(args):
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+    import embedding_service
+    embedding_service.serve(args.serve, args.processes)
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def start_embedding_worker(path: str, processes: int, fake: bool) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "benchmarks.embedding_worker", "--serve", path,
+           "--processes", str(processes)]
+    if fake:
+        cmd.append("--fake-embeddings")
+    proc = subprocess.Popen(cmd)
+    deadline = time.monotonic() + 300
+    while not os.path.exists(path):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("embedding worker did not start")
+        time.sleep(0.1)
+    time.sleep(0.2 * processes)   # let forked processes reach accept()
+    return proc
+
+
+def run_case(api_workers: int, seconds: float, fake: bool, socket_path: str = "") -> dict:
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    if socket_path:
+        env["EMBEDDING_SOCKET"] = socket_path
+    cmd = [sys.executable, "-m", "benchmarks.embedding_worker", "--api-worker",
+           "--seconds", str(seconds)]
+    if fake:
+        cmd.append("--fake-embeddings")
+
+    procs = [subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              text=True) for _ in range(api_workers)]
+    try:
+        for p in procs:
+            if p.stdout.readline().strip() != "ready":
+                raise RuntimeError("API worker failed to start")
+        t0 = time.perf_counter()
+        for p in procs:
+            p.stdin.write("go\n")
+            p.stdin.flush()
+        results = [json.loads(p.stdout.readline()) for p in procs]
+        elapsed = time.perf_counter() - t0
+        api_pss = sum(pss_mb(p.pid) for p in procs)
+        for p in procs:
+            p.stdin.write("done\n")
+            p.stdin.flush()
+    finally:
+        for p in procs:
+            p.wait(timeout=30)
+
+    return {
+        "api_workers": api_workers,
+        "api_pss_mb": round(api_pss, 1),
+        "chunks_per_s": round(sum(r["chunks"] for r in results) / elapsed, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="In-process models vs shared embedding worker")
+    ap.add_argument("--api-workers", default="1,2,4")
+    ap.add_argument("--worker-processes", default="1,2")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--out", help="write results JSON here")
+    # Internal: child process roles
+    ap.add_argument("--api-worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--serve", help=argparse.SUPPRESS)
+    ap.add_argument("--processes", type=int, default=1, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.api_worker:
+        return run_api_worker(args)
+    if args.serve:
+        return run_embedding_worker(args)
+
+    results = []
+    print(f"{'mode':<10} {'api':>4} {'emb procs':>9} {'total PSS MB':>13} "
+          f"{'MB / api worker':>16} {'chunks/s':>10}")
+
+    def report(row):
+        results.append(row)
+        print(f"{row['mode']:<10} {row['api_workers']:>4} {row['worker_processes']:>9} "
+              f"{row['total_pss_mb']:>13} {row['total_pss_mb'] / row['api_workers']:>16.1f} "
+              f"{row['chunks_per_s']:>10}")
+
+    for n in (int(x) for x in args.api_workers.split(",")):
+        row = run_case(n, args.seconds, args.fake_embeddings)
+        report({**row, "mode": "local", "worker_processes": 0, "total_pss_mb": row["api_pss_mb"]})
+
+    for procs in (int(x) for x in args.worker_processes.split(",")):
+        path = os.path.join(tempfile.mkdtemp(prefix="embed_bench_"), "embed.sock")
+        worker = start_embedding_worker(path, procs, args.fake_embeddings)
+        try:
+            for n in (int(x) for x in args.api_workers.split(",")):
+                row = run_case(n, args.seconds, args.fake_embeddings, socket_path=path)
+                worker_pss = pss_mb(worker.pid)
+                report({**row, "mode": "shared", "worker_processes": procs,
+                        "worker_pss_mb": worker_pss,
+                        "total_pss_mb": round(row["api_pss_mb"] + worker_pss, 1)})
+        finally:
+            worker.terminate()
+            worker.wait(timeout=30)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
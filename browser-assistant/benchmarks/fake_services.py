@@ -0,0 +1,161 @@
+"""
+Local stand-ins for the external services the backend calls.
+
+  llm_app        OpenAI/Groq-compatible /openai/v1/chat/completions with
+                 configurable latency, jitter and SSE streaming
+  transcript_app /transcripts/{video_id} for youtube_service (TRANSCRIPT_API_URL)
+  google_app     Docs create/batchUpdate + Drive permissions
+                 (GOOGLE_DOCS_ENDPOINT / GOOGLE_DRIVE_ENDPOINT)
+
+Run all three standalone:
+
+    python -m benchmarks.fake_services --llm-latency-ms 800 --port 9400
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmarks.synthetic import make_transcript
+
+
+def llm_app(latency_ms: float = 500, jitter_ms: float = 100,
+            tokens: int = 120, token_interval_ms: float = 5) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        words = [f"word{i}" for i in range(tokens)]
+        answer = f"Fake answer ({len(prompt)} prompt chars). " + " ".join(words)
+        created = int(time.time())
+        model = body.get("model", "fake")
+
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+        if body.get("stream"):
+            async def events():
+                for i, piece in enumerate(answer.split(" ")):
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                        "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece + " "},
+                                     "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(token_interval_ms / 1000)
+                done = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                        "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return {
+            "id": "chatcmpl-fake", "object": "chat.completion",
+            "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": tokens,
+                      "total_tokens": len(prompt) // 4 + tokens},
+        }
+
+    return app
+
+
+def transcript_app(duration_s: int = 1200, latency_ms: float = 150) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/transcripts/{video_id}")
+    async def transcript(video_id: str):
+        await asyncio.sleep(latency_ms / 1000)
+        seed = sum(map(ord, video_id))
+        return {"video_id": video_id, "snippets": make_transcript(duration_s, seed=seed)}
+
+    return app
+
+
+def google_app(latency_ms: float = 200) -> FastAPI:
+    app = FastAPI()
+    delay = latency_ms / 1000
+
+    @app.post("/v1/documents")
+    async def create_doc(request: Request):
+        body = await request.json()
+        await asyncio.sleep(delay)
+        return {"documentId": uuid.uuid4().hex, "title": body.get("title", "")}
+
+    @app.post("/v1/documents/{doc_id}:batchUpdate")
+    async def batch_update(doc_id: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(delay)
+        return {"documentId": doc_id, "replies": [{} for _ in body.get("requests", [])]}
+
+    @app.post("/files/{file_id}/permissions")
+    @app.post("/drive/v3/files/{file_id}/permissions")
+    async def permission(file_id: str):
+        await asyncio.sleep(delay)
+        return {"id": "anyoneWithLink", "type": "anyone", "role": "reader"}
+
+    return app
+
+
+def combined_app(**kwargs) -> FastAPI:
+    """All three fakes on one port (their paths don't overlap)."""
+    app = FastAPI()
+    for sub in (
+        llm_app(kwargs.get("llm_latency_ms", 500), kwargs.get("llm_jitter_ms", 100)),
+        transcript_app(kwargs.get("transcript_seconds", 1200)),
+        google_app(kwargs.get("google_latency_ms", 200)),
+    ):
+        app.router.routes.extend(sub.router.routes)
+    return app
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn in a daemon thread."""
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self) -> "ServerThread":
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Groq / transcript / Google services")
+    ap.add_argument("--port", type=int, default=9400)
+    ap.add_argument("--llm-latency-ms", type=float, default=500)
+    ap.add_argument("--llm-jitter-ms", type=float, default=100)
+    ap.add_argument("--google-latency-ms", type=float, default=200)
+    ap.add_argument("--transcript-seconds", type=int, default=1200)
+    args = ap.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"GROQ_API_BASE={url}\nTRANSCRIPT_API_URL={url}\n"
+          f"GOOGLE_DOCS_ENDPOINT={url}\nGOOGLE_DRIVE_ENDPOINT={url}")
+    uvicorn.run(combined_app(**vars(args)), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+In-process fakes for benchmarks and load tests.
+
+fake_answer() is a deterministic stand-in for llm_service.get_answer.
+FakeLLMBackend is an llm_client backend with configurable latency,
+stragglers and errors, for exercising retries and hedging without a server.
+install_fake_embeddings() must run BEFORE rag_service is imported; it replaces
+SentenceTransformer with a hashing embedder so pipeline overhead can be
+measured on machines without the model weights (results are then not
+comparable with real-model runs).
+"""
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+
+from llm_client import AttemptError, LLMBackend
+
+EMBEDDING_DIM = 384
+
+
+def fake_answer(context: str, question: str) -> str:
+    """Deterministic stand-in for the LLM: echoes a digest of its inputs."""
+    digest = hashlib.sha256(f"{context}\x00{question}".encode()).hexdigest()[:12]
+    first = context.strip().split("\n", 1)[0][:200] if context.strip() else question[:200]
+    return f"Answer {digest}: {first}"
+
+
+class HashingEmbedder:
+    """Bag-of-words feature hashing, L2-normalised; same call shape as SentenceTransformer.encode."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return EMBEDDING_DIM
+
+    def encode(self, sentences, normalize_embeddings: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+                out[row, h % EMBEDDING_DIM] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1, norms)
+        return out[0] if single else out
+
+
+def install_fake_embeddings():
+    import sentence_transformers
+    sentence_transformers.SentenceTransformer = HashingEmbedder
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    llm_client.LLMBackend stand-in. Each call sleeps latency_ms ± jitter_ms;
+    with probability straggler_rate it sleeps straggler_ms instead, and with
+    error_rate it fails with a retryable error. Sleeps are cut at the timeout.
+    """
+
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 50,
+                 straggler_rate: float = 0.0, straggler_ms: float = 3000,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.straggler_rate = straggler_rate
+        self.straggler_ms = straggler_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def complete(self, messages: list[dict], timeout: float) -> str:
+        with self._lock:
+            self.calls += 1
+            roll, jitter = self._rng.random(), self._rng.uniform(-1, 1)
+        if roll < self.error_rate:
+            time.sleep(self.latency_ms / 4000)
+            raise AttemptError("fake upstream 503", retryable=True)
+        straggler = roll < self.error_rate + self.straggler_rate
+        delay = (self.straggler_ms if straggler else self.latency_ms + jitter * self.jitter_ms) / 1000
+        if delay > timeout:
+            time.sleep(timeout)
+            raise AttemptError("timeout", retryable=True)
+        time.sleep(delay)
+        return fake_answer("", messages[-1]["content"])
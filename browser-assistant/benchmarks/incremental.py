@@ -0,0 +1,120 @@
+"""
+Incremental per-tab re-ingestion vs re-ingesting the whole page every turn.
+
+A page is asked about over several turns, changing a little between turns:
+
+  append    a chat thread or feed growing at the bottom
+  prepend   new posts arriving at the top (every offset shifts)
+  edits     a live dashboard: a few numbers change in place at scattered points
+
+Each scenario runs once through rag_service.process_page_and_query without a
+tab_id (full re-ingest) and once with one (see page_versions.py), each against
+a fresh cache. Reported per mode, summed over turns after the first:
+
+  chunked       chunks produced by the chunker
+  embedded      chunks that had to be encoded (cache misses)
+  ms/turn       median retrieval time per turn
+  same context  share of turns whose context equals the full re-ingest's
+
+    cd browser-assistant
+    python -m benchmarks.incremental --page-bytes 200000 --turns 20 --fake-embeddings
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import make_page
+
+SCENARIOS = ("append", "prepend", "edits")
+
+
+def versions(scenario: str, page_bytes: int, turns: int, seed: int = 0) -> list[str]:
+    """The page as seen on each turn."""
+    rng = random.Random(seed)
+    page = make_page(page_bytes, seed=seed)
+    out = [page]
+    for turn in range(1, turns):
+        if scenario == "append":
+            page = page + "\n\n" + make_page(1_500, seed=seed + turn)
+        elif scenario == "prepend":
+            page = make_page(1_500, seed=seed + turn) + "\n\n" + page
+        else:
+            for _ in range(5):
+                numbers = list(re.finditer(r"\[\d+\]", page))
+                if not numbers:
+                    break
+                m = rng.choice(numbers)
+                page = f"{page[:m.start()]}[{rng.randint(100, 999)}]{page[m.end():]}"
+        out.append(page)
+    return out
+
+
+def run(pages: list[str], question: str, top_k: int, tab: bool) -> tuple[dict, list[str]]:
+    import rag_service
+    from observability import CACHE_MISSES, TAB_CHUNKS
+    from text_pipeline import preprocess_page
+
+    rag_service.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="incremental_"), "rag.db")
+    tab_id = f"bench-{time.monotonic_ns()}" if tab else ""
+    contexts, samples, chunked, embedded = [], [], 0, 0
+    for turn, page in enumerate(pages):
+        misses0, rechunked0 = CACHE_MISSES.value(cache="chunks"), TAB_CHUNKS.value(result="rechunked")
+        t0 = time.perf_counter()
+        context, _, _ = rag_service.process_page_and_query(page, question, top_k=top_k, tab_id=tab_id)
+        elapsed = time.perf_counter() - t0
+        contexts.append(context)
+        if turn == 0:
+            continue
+        samples.append(elapsed)
+        embedded += CACHE_MISSES.value(cache="chunks") - misses0
+        chunked += (TAB_CHUNKS.value(result="rechunked") - rechunked0 if tab
+                    else len(preprocess_page(page)))
+    return {
+        "mode": "tab_id" if tab else "full",
+        "chunked": int(chunked),
+        "embedded": int(embedded),
+        "ms_per_turn": round(statistics.median(samples) * 1000, 2),
+    }, contexts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental per-tab re-ingestion vs full re-ingestion")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--page-bytes", type=int, default=200_000)
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+
+    question = "What changed in the latest update?"
+    results = []
+    print(f"{'scenario':>9} {'mode':>7} {'chunked':>8} {'embedded':>9} {'ms/turn':>8} {'same context':>13}")
+    for scenario in args.scenarios.split(","):
+        pages = versions(scenario, args.page_bytes, args.turns)
+        full, reference = run(pages, question, args.top_k, tab=False)
+        incremental, contexts = run(pages, question, args.top_k, tab=True)
+        full["same_context"] = 1.0
+        incremental["same_context"] = round(
+            sum(a == b for a, b in zip(contexts[1:], reference[1:])) / max(1, len(pages) - 1), 3)
+        for row in (full, incremental):
+            results.append({"scenario": scenario, **row})
+            print(f"{scenario:>9} {row['mode']:>7} {row['chunked']:>8} {row['embedded']:>9} "
+                  f"{row['ms_per_turn']:>8} {row['same_context']:>13.0%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Tail latency of LLM calls: the old single attempt vs llm_client with
+retries, and with hedging.
+
+Calls go to benchmarks.fakes.FakeLLMBackend, which answers in
+--latency-ms ± --jitter-ms. A --straggler-rate share of calls takes
+--straggler-ms and an --error-rate share fails with a retryable 503.
+Each configuration runs --calls calls from --concurrency threads and
+reports p50/p95/p99, failed calls, and upstream requests per call (the
+extra load that retries and hedges cost).
+
+    cd browser-assistant
+    python -m benchmarks.llm_client --calls 400 --straggler-rate 0.03 --error-rate 0.02
+
+With --http, the same calls go through GroqBackend to benchmarks.fake_services
+instead, once with the pooled keep-alive client and once with a new
+connection per call, to show connection setup cost.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.fakes import FakeLLMBackend
+from llm_client import AttemptError, GroqBackend, LLMClient, LLMError
+
+MESSAGES = [{"role": "user", "content": "What is this page about?"}]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run(client: LLMClient, calls: int, concurrency: int) -> dict:
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            client.complete(MESSAGES)
+            return time.perf_counter() - t0, True
+        except LLMError:
+            return time.perf_counter() - t0, False
+
+    # Warm the latency window so hedging has a p95 to work from
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(min(calls, 50))))
+        upstream0 = getattr(client.backend, "calls", 0)
+        results = list(pool.map(one, range(calls)))
+
+    latencies = [t for t, ok in results if ok]
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "failed": sum(not ok for _, ok in results),
+        "upstream_per_call": round((getattr(client.backend, "calls", 0) - upstream0) / calls, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="LLM client retries and hedging vs a single attempt")
+    ap.add_argument("--calls", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--jitter-ms", type=float, default=50)
+    ap.add_argument("--straggler-rate", type=float, default=0.03)
+    ap.add_argument("--straggler-ms", type=float, default=4000)
+    ap.add_argument("--error-rate", type=float, default=0.02)
+    ap.add_argument("--deadline", type=float, default=10)
+    ap.add_argument("--http", action="store_true", help="pooled vs per-call connections to fake_services")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    if args.http:
+        results = run_http(args)
+    else:
+        backend = lambda: FakeLLMBackend(args.latency_ms, args.jitter_ms, args.straggler_rate,
+                                         args.straggler_ms, args.error_rate)
+        configs = {
+            "single attempt": LLMClient(backend(), deadline=args.deadline, retries=0, hedge=False),
+            "retries": LLMClient(backend(), deadline=args.deadline, retries=2, hedge=False),
+            "retries+hedge": LLMClient(backend(), deadline=args.deadline, retries=2, hedge=True),
+        }
+        results = []
+        print(f"{'config':>15} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7} {'upstream/call':>14}")
+        for name, client in configs.items():
+            row = {"config": name, **run(client, args.calls, args.concurrency)}
+            client.close()
+            results.append(row)
+            print(f"{name:>15} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+                  f"{row['failed']:>7} {row['upstream_per_call']:>14}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+class _FreshConnectionBackend(GroqBackend):
+    """GroqBackend that opens a new connection for every call (no keep-alive)."""
+
+    def complete(self, messages, timeout):
+        with httpx.Client(base_url=self._client.base_url, headers=self._client.headers) as fresh:
+            try:
+                resp = fresh.post("/openai/v1/chat/completions",
+                                  json={"model": self.model, "messages": messages,
+                                        "temperature": self.temperature}, timeout=timeout)
+            except httpx.HTTPError as e:
+                raise AttemptError(repr(e), retryable=True)
+        return resp.json()["choices"][0]["message"]["content"]
+
+
+def run_http(args) -> list[dict]:
+    from benchmarks.fake_services import ServerThread, llm_app
+    server = ServerThread(llm_app(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms), 9431).start()
+    results = []
+    print(f"{'connections':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, backend_cls in (("pooled", GroqBackend), ("per call", _FreshConnectionBackend)):
+            client = LLMClient(backend_cls(base_url=server.url, api_key="fake"),
+                               deadline=args.deadline, retries=0, hedge=False)
+            row = {"connections": name, **run(client, args.calls, args.concurrency)}
+            row.pop("upstream_per_call")
+            client.close()
+            results.append(row)
+            print(f"{name:>12} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+End-to-end load test for one main.py process.
+
+Starts local fakes for Groq, YouTube transcripts and Google Docs/Drive,
+launches the backend against them (in a scratch directory, so the real
+SQLite caches are untouched), then drives mixed traffic — /chat,
+/youtube/chat, /track-price and /summarize-to-gdocs — at increasing
+concurrency. For each step it reports throughput and p50/p95/p99 latency,
+and at the end the saturation point: the step after which more concurrency
+stops buying throughput.
+
+    cd browser-assistant
+    python -m benchmarks.loadtest --concurrency 1,4,16,64 --step-seconds 20 --out load.json
+    python -m benchmarks.loadtest --target http://127.0.0.1:8090   # existing server, no fakes
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fake_services import ServerThread, combined_app
+from benchmarks.synthetic import make_page
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "chat=60,youtube_chat=20,track_price=15,summarize=5"
+VIDEO_IDS = [f"loadtest{i:03d}" for i in range(8)]   # 11 chars, like real IDs
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Traffic:
+    """Builds randomised requests for each traffic kind."""
+
+    def __init__(self, seed: int, pages: int, page_bytes: int):
+        self.rng = random.Random(seed)
+        self.pages = [make_page(page_bytes, seed=i) for i in range(pages)]
+        self.questions = [
+            "What is this page about?", "Summarize the key findings.",
+            "What does it say about battery performance?", "Which method is recommended?",
+        ]
+
+    def build(self, kind: str) -> tuple[str, str, dict]:
+        rng = self.rng
+        if kind == "chat":
+            return "POST", "/chat", {"message": rng.choice(self.questions),
+                                     "context": rng.choice(self.pages)}
+        if kind == "youtube_chat":
+            return "POST", "/youtube/chat", {"video_id": rng.choice(VIDEO_IDS),
+                                             "message": rng.choice(self.questions)}
+        if kind == "track_price":
+            n = rng.randint(0, 499)
+            return "POST", "/track-price", {"url": f"https://shop.example/item/{n}",
+                                            "title": f"Item {n}",
+                                            "price": f"₹{rng.randint(500, 50000):,}"}
+        if kind == "summarize":
+            return "POST", "/summarize-to-gdocs", {"context": rng.choice(self.pages),
+                                                   "page_title": "Load test page",
+                                                   "page_url": "https://example.com/page"}
+        raise ValueError(f"unknown traffic kind {kind!r}")
+
+
+async def run_step(client: httpx.AsyncClient, traffic: Traffic, mix: dict[str, int],
+                   concurrency: int, seconds: float) -> dict:
+    kinds, weights = list(mix), list(mix.values())
+    latencies: dict[str, list[float]] = {k: [] for k in kinds}
+    errors: dict[str, int] = {k: 0 for k in kinds}
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            kind = traffic.rng.choices(kinds, weights)[0]
+            method, path, body = traffic.build(kind)
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, json=body)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[kind].append(time.perf_counter() - t0)
+            else:
+                errors[kind] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    everything = [x for xs in latencies.values() for x in xs]
+    total_errors = sum(errors.values())
+    step = {
+        "concurrency": concurrency,
+        "requests":    len(everything),
+        "errors":      total_errors,
+        "error_rate":  round(total_errors / max(1, len(everything) + total_errors), 4),
+        "throughput_rps": round(len(everything) / elapsed, 2),
+        "p50_ms": round(percentile(everything, 50) * 1000, 1),
+        "p95_ms": round(percentile(everything, 95) * 1000, 1),
+        "p99_ms": round(percentile(everything, 99) * 1000, 1),
+        "by_kind": {
+            k: {"requests": len(v), "errors": errors[k],
+                "p50_ms": round(percentile(v, 50) * 1000, 1),
+                "p99_ms": round(percentile(v, 99) * 1000, 1)}
+            for k, v in latencies.items()
+        },
+    }
+    print(f"c={concurrency:<4} {step['throughput_rps']:>8.2f} req/s  "
+          f"p50 {step['p50_ms']:>8.1f} ms  p95 {step['p95_ms']:>8.1f} ms  "
+          f"p99 {step['p99_ms']:>8.1f} ms  errors {step['error_rate']:.2%}")
+    return step
+
+
+def find_saturation(steps: list[dict], min_gain: float, max_error_rate: float) -> dict:
+    """Last step whose throughput still grew by at least min_gain over the previous one."""
+    best = steps[0]
+    for prev, step in zip(steps, steps[1:]):
+        if step["error_rate"] > max_error_rate:
+            break
+        if step["throughput_rps"] < prev["throughput_rps"] * (1 + min_gain):
+            break
+        best = step
+    return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"],
+            "p99_ms": best["p99_ms"]}
+
+
+def start_backend(fakes_url: str, workdir: str, port: int, fake_embeddings: bool) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH":            os.pathsep.join([str(BACKEND_DIR), os.environ.get("PYTHONPATH", "")]),
+        "GROQ_API_KEY":          "fake-key",
+        "GROQ_API_BASE":         fakes_url,
+        "TRANSCRIPT_API_URL":    fakes_url,
+        "GOOGLE_DOCS_ENDPOINT":  fakes_url,
+        "GOOGLE_DRIVE_ENDPOINT": fakes_url,
+    }
+    cmd = [sys.executable, "-m", "benchmarks.serve", "--port", str(port)]
+    if fake_embeddings:
+        cmd.append("--fake-embeddings")
+    return subprocess.Popen(cmd, cwd=workdir, env=env)
+
+
+async def wait_ready(client: httpx.AsyncClient, proc: subprocess.Popen | None, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"backend exited with code {proc.returncode}")
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("backend did not become ready")
+
+
+async def drive(args, base_url: str, proc: subprocess.Popen | None) -> dict:
+    mix = {k: int(v) for k, v in (p.split("=") for p in args.mix.split(","))}
+    traffic = Traffic(args.seed, args.pages, args.page_bytes)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, proc)
+        if "youtube_chat" in mix:
+            for vid in VIDEO_IDS:
+                await client.post("/youtube/load", json={"url": f"https://youtu.be/{vid}"})
+
+        steps = []
+        for c in (int(x) for x in args.concurrency.split(",")):
+            steps.append(await run_step(client, traffic, mix, c, args.step_seconds))
+            if steps[-1]["error_rate"] > args.max_error_rate and len(steps) > 1:
+                print("Error rate above threshold, stopping ramp.")
+                break
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "steps": steps,
+        "saturation": find_saturation(steps, args.min_gain, args.max_error_rate),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test the backend with local fakes")
+    ap.add_argument("--target", help="hit an already running backend instead of spawning one")
+    ap.add_argument("--concurrency", default="1,2,4,8,16,32,64")
+    ap.add_argument("--step-seconds", type=float, default=20)
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight,... (chat, youtube_chat, "
+                                                       "track_price, summarize)")
+    ap.add_argument("--llm-latency-ms", type=float, default=500)
+    ap.add_argument("--llm-jitter-ms", type=float, default=100)
+    ap.add_argument("--google-latency-ms", type=float, default=200)
+    ap.add_argument("--pages", type=int, default=20, help="distinct synthetic pages in the mix")
+    ap.add_argument("--page-bytes", type=int, default=20_000)
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--min-gain", type=float, default=0.1,
+                    help="throughput growth per step below which the server is saturated")
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    fakes = proc = None
+    if args.target:
+        base_url = args.target
+    else:
+        fakes = ServerThread(combined_app(llm_latency_ms=args.llm_latency_ms,
+                                          llm_jitter_ms=args.llm_jitter_ms,
+                                          google_latency_ms=args.google_latency_ms),
+                             port=free_port()).start()
+        port = free_port()
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        proc = start_backend(fakes.url, workdir, port, args.fake_embeddings)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        report = asyncio.run(drive(args, base_url, proc))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if fakes is not None:
+            fakes.stop()
+
+    sat = report["saturation"]
+    print(f"\nSaturation: ~{sat['throughput_rps']} req/s at concurrency {sat['concurrency']} "
+          f"(p99 {sat['p99_ms']} ms)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark suite for the RAG and YouTube pipelines.
+
+Runs embed_chunks, get_top_chunks, process_page_and_query (and the /chat
+pipeline with a deterministic fake LLM) on synthetic pages, and
+store_youtube_chunks / query_youtube on synthetic transcripts, with cold
+(empty) and warm (pre-populated) embedding caches. Reports p50/p99 latency,
+throughput, peak RSS and cache DB size, and writes JSON that
+benchmarks.compare can diff between releases.
+
+    cd browser-assistant
+    python -m benchmarks.pipeline --out bench.json
+    python -m benchmarks.pipeline --sizes 1KB,100KB --durations 1m,1h --fake-embeddings
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import make_page, make_transcript, parse_size, parse_duration
+
+DEFAULT_SIZES     = "1KB,10KB,100KB,1MB,5MB"
+DEFAULT_DURATIONS = "1m,10m,1h,5h"
+PAGE_QUERY        = "what does the report say about battery performance"
+VIDEO_QUERY       = "what is said about the training method"
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+class Suite:
+    def __init__(self, workdir: str, repeats: int):
+        import rag_service
+        self.rag = rag_service
+        self.workdir = workdir
+        self.repeats = repeats
+        self.results: list[dict] = []
+
+    def fresh_db(self) -> str:
+        self.rag.DB_PATH = os.path.join(self.workdir, f"{uuid.uuid4().hex}.db")
+        return self.rag.DB_PATH
+
+    def record(self, case: str, label: str, samples: list[float], units: float, unit_name: str):
+        mean = statistics.fmean(samples)
+        row = {
+            "case":       case,
+            "input":      label,
+            "runs":       len(samples),
+            "p50_ms":     round(percentile(samples, 50) * 1000, 3),
+            "p99_ms":     round(percentile(samples, 99) * 1000, 3),
+            "mean_ms":    round(mean * 1000, 3),
+            "throughput": round(units / mean, 1) if mean else None,
+            "throughput_unit": f"{unit_name}/s",
+            "peak_rss_mb": peak_rss_mb(),
+            "db_bytes":   os.path.getsize(self.rag.DB_PATH) if os.path.exists(self.rag.DB_PATH) else 0,
+        }
+        self.results.append(row)
+        print(f"{case:34} {label:>6}  p50 {row['p50_ms']:>10.2f} ms  p99 {row['p99_ms']:>10.2f} ms"
+              f"  {row['throughput']:>12} {row['throughput_unit']:8}  rss {row['peak_rss_mb']} MB"
+              f"  db {row['db_bytes']:,} B")
+
+    def timed(self, fn, setup=None) -> list[float]:
+        samples = []
+        for _ in range(self.repeats):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        return samples
+
+    # ── Pages ────────────────────────────────────────────────────────────────
+
+    def run_page(self, label: str, size: int):
+        from benchmarks.fakes import fake_answer
+        from text_pipeline import preprocess_page
+        rag = self.rag
+        page = make_page(size)
+        chunks = preprocess_page(page)
+
+        def store():
+            conn = rag.get_db()
+            rag.embed_chunks(chunks, conn)
+            conn.close()
+
+        self.record("embed_chunks/cold", label, self.timed(store, setup=self.fresh_db), size, "B")
+        self.record("embed_chunks/warm", label, self.timed(store), size, "B")
+
+        conn = rag.get_db()
+        stored = rag.embed_chunks(chunks, conn)
+        conn.close()
+        self.record("get_top_chunks", label,
+                    self.timed(lambda: rag.get_top_chunks(PAGE_QUERY, stored, top_k=10)),
+                    len(stored), "chunks")
+
+        query = lambda: rag.process_page_and_query(page, PAGE_QUERY, top_k=10)
+        self.record("process_page_and_query/cold", label, self.timed(query, setup=self.fresh_db), size, "B")
+        self.record("process_page_and_query/warm", label, self.timed(query), size, "B")
+
+        def chat():
+            context, sources, _ = rag.process_page_and_query(page, PAGE_QUERY, top_k=10)
+            rag.find_best_source(fake_answer(context, PAGE_QUERY), sources)
+
+        self.record("chat_pipeline/warm (fake LLM)", label, self.timed(chat), size, "B")
+
+    # ── Transcripts ──────────────────────────────────────────────────────────
+
+    def run_transcript(self, label: str, duration: int):
+        from youtube_service import build_timed_chunks
+        import youtube_rag
+        chunks = build_timed_chunks(make_transcript(duration), chunk_size=30)
+        video_id = f"bench{duration:06d}"
+
+        store = lambda: youtube_rag.store_youtube_chunks(video_id, chunks)
+        self.record("store_youtube_chunks/cold", label, self.timed(store, setup=self.fresh_db),
+                    len(chunks), "chunks")
+        self.record("store_youtube_chunks/warm", label, self.timed(store), len(chunks), "chunks")
+        self.record("query_youtube", label,
+                    self.timed(lambda: youtube_rag.query_youtube(video_id, VIDEO_QUERY, top_k=10)),
+                    len(chunks), "chunks")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RAG / YouTube pipeline benchmarks")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="page sizes, e.g. 1KB,1MB")
+    ap.add_argument("--durations", default=DEFAULT_DURATIONS, help="transcript lengths, e.g. 1m,5h")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--fake-embeddings", action="store_true",
+                    help="use a hashing embedder instead of the SentenceTransformer model")
+    ap.add_argument("--out", help="write machine-readable results to this JSON file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")   # keep per-call INFO logs out of the timings
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    try:
+        suite = Suite(workdir, args.repeats)
+        suite.fresh_db()
+        for label in args.sizes.split(","):
+            suite.run_page(label, parse_size(label))
+        for label in args.durations.split(","):
+            suite.run_transcript(label, parse_duration(label))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp":  datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision":   git_revision(),
+            "python":     platform.python_version(),
+            "machine":    f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+            "embeddings": "fake" if args.fake_embeddings else "all-MiniLM-L6-v2",
+            "repeats":    args.repeats,
+        },
+        "results": suite.results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
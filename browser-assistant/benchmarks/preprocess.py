@@ -0,0 +1,98 @@
+"""
+Split + clean + hash throughput for very large pages: in-process vs the
+text_pipeline process pool, on 1–10 MB inputs.
+
+Also reports how long a thread in the API process waits to get scheduled
+while preprocessing runs (max and p99 lag of a 1 ms ticker). That is the
+GIL stall other requests see.
+
+    cd browser-assistant
+    python -m benchmarks.preprocess --sizes 1MB,2MB,5MB,10MB --workers 0,2,4
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import text_pipeline
+from benchmarks.synthetic import make_page, parse_size
+
+
+class Ticker:
+    """Background thread that measures how late its 1 ms sleeps wake up."""
+
+    def __init__(self):
+        self.lags: list[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            time.sleep(0.001)
+            self.lags.append(time.perf_counter() - t0 - 0.001)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def measure(page: str, repeats: int) -> dict:
+    samples, lags = [], []
+    for _ in range(repeats):
+        with Ticker() as ticker:
+            t0 = time.perf_counter()
+            chunks = text_pipeline.preprocess_page(page)
+            samples.append(time.perf_counter() - t0)
+        lags += ticker.lags
+    lags.sort()
+    return {
+        "seconds": statistics.median(samples),
+        "chunks": len(chunks),
+        "max_lag_ms": round(lags[-1] * 1000, 1) if lags else 0.0,
+        "p99_lag_ms": round(lags[int(len(lags) * 0.99)] * 1000, 1) if lags else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="In-process vs process-pool page preprocessing")
+    ap.add_argument("--sizes", default="1MB,2MB,5MB,10MB")
+    ap.add_argument("--workers", default="0,2,4", help="0 = in-process")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    pages = {label: make_page(parse_size(label)) for label in args.sizes.split(",")}
+    results = []
+    print(f"{'size':>6} {'workers':>8} {'MB/s':>8} {'ms':>9} {'chunks':>7} "
+          f"{'max lag ms':>11} {'p99 lag ms':>11}")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        text_pipeline.shutdown_pool()
+        text_pipeline.PREPROCESS_WORKERS = workers
+        text_pipeline.PREPROCESS_PARALLEL_MIN_CHARS = 0
+        text_pipeline.start_pool()
+
+        for label, page in pages.items():
+            m = measure(page, args.repeats)
+            mb = len(page.encode()) / 1e6
+            row = {"input": label, "workers": workers, "mb_s": round(mb / m["seconds"], 1),
+                   "ms": round(m["seconds"] * 1000, 1), "chunks": m["chunks"],
+                   "max_lag_ms": m["max_lag_ms"], "p99_lag_ms": m["p99_lag_ms"]}
+            results.append(row)
+            print(f"{label:>6} {workers:>8} {row['mb_s']:>8} {row['ms']:>9} {row['chunks']:>7} "
+                  f"{row['max_lag_ms']:>11} {row['p99_lag_ms']:>11}")
+
+    text_pipeline.shutdown_pool()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Price storage report: row-per-observation vs change-point (run) storage.
+
+Builds a synthetic prices.db (hourly observations, prices that change rarely),
+compacts a copy into runs, then compares file size and get_price_history
+latency in both modes, checking that the stats and (bucketed) history
+returned are identical.
+
+    cd browser-assistant
+    python -m benchmarks.price_storage --products 200 --days 365
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import price_service
+
+
+def build_rows_db(path: str, products: int, days: int, change_prob: float, seed: int):
+    rng = random.Random(seed)
+    price_service.DB_PATH = path
+    price_service.PRICE_STORAGE = "rows"
+    conn = price_service.get_db()
+    start = datetime(2024, 1, 1)
+    rows = []
+    for p in range(products):
+        url = f"https://shop.example/item/{p}"
+        price = float(rng.randint(500, 50000))
+        for h in range(days * 24):
+            if rng.random() < change_prob:
+                price = round(price * rng.uniform(0.9, 1.1), 2)
+            ts = (start + timedelta(hours=h)).strftime("%Y-%m-%d %H:%M:%S")
+            rows.append((url, "shop.example", f"Item {p}", price, "₹", "", ts))
+    conn.executemany("""
+        INSERT INTO price_history (url, domain, title, price, currency, image_url, recorded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.execute("DELETE FROM price_summary")
+    conn.commit()
+    conn.close()
+    # Rebuild summaries from the synthetic history
+    price_service._summary_ready.discard(path)
+    price_service.get_db().close()
+    return len(rows)
+
+
+def vacuum_size(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def time_reads(path: str, mode: str, urls: list[str], repeats: int) -> tuple[list[float], dict]:
+    price_service.DB_PATH = path
+    price_service.PRICE_STORAGE = mode
+    price_service.get_db().close()   # run migrations outside the timed loop
+    samples, results = [], {}
+    for _ in range(repeats):
+        for url in urls:
+            t0 = time.perf_counter()
+            results[url] = price_service.get_price_history(url)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples, results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--products", type=int, default=100)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--change-prob", type=float, default=0.01,
+                    help="chance the price moves at each hourly observation")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="price_storage_")
+    rows_db = os.path.join(tmp, "rows.db")
+    runs_db = os.path.join(tmp, "runs.db")
+    try:
+        observations = build_rows_db(rows_db, args.products, args.days,
+                                      args.change_prob, args.seed)
+        shutil.copy(rows_db, runs_db)
+
+        price_service.DB_PATH = runs_db
+        price_service.PRICE_STORAGE = "runs"
+        t0 = time.perf_counter()
+        price_service.get_db().close()   # compacts price_history into price_runs
+        migrate_s = time.perf_counter() - t0
+
+        urls = [f"https://shop.example/item/{p}" for p in range(args.products)]
+        rows_ms, rows_res = time_reads(rows_db, "rows", urls, args.repeats)
+        runs_ms, runs_res = time_reads(runs_db, "runs", urls, args.repeats)
+
+        strip = lambda r: {k: v for k, v in r.items() if k not in ("history", "resolution")}
+        stats_match = all(strip(rows_res[u]) == strip(runs_res[u]) for u in urls)
+        history_match = all(rows_res[u] == runs_res[u] for u in urls)
+        (runs,) = sqlite3.connect(runs_db).execute("SELECT COUNT(*) FROM price_runs").fetchone()
+
+        report = {
+            "products":        args.products,
+            "observations":    observations,
+            "runs":            runs,
+            "migrate_seconds": round(migrate_s, 3),
+            "rows_db_bytes":   vacuum_size(rows_db),
+            "runs_db_bytes":   vacuum_size(runs_db),
+            "rows_read_ms_p50": round(statistics.median(rows_ms), 3),
+            "runs_read_ms_p50": round(statistics.median(runs_ms), 3),
+            "stats_identical": stats_match,
+            "history_identical": history_match,
+        }
+        report["size_reduction"] = round(1 - report["runs_db_bytes"] / report["rows_db_bytes"], 3)
+
+        for key, value in report.items():
+            print(f"{key:18} {value}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Float vs int8 embedding search: recall@k, memory, disk and latency.
+
+Chunks of synthetic pages are embedded once. For each corpus size, the
+exact float32 top-k (what score_chunks computed before int8 storage) is the
+reference. The report compares:
+
+  int8 only   top-k straight from quantized scores, no rerank
+  two-stage   quantization.two_stage_search, shortlist reranked in float32
+
+recall@k counts a returned chunk as a hit when its exact score reaches the
+k-th best exact score, so ties don't count as misses. Memory is the search
+matrix per corpus: the float lists embed_chunks used to return, a float32
+matrix, and int8 codes + scales. Disk is bytes per stored vector: JSON text
+(old rows), the float32 blob, and qvec + qscale.
+
+    cd browser-assistant
+    python -m benchmarks.quantization --sizes 1000,10000,50000 --shortlists 32,64,128
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_page
+
+
+def corpus(n: int, embed) -> tuple[list[str], np.ndarray]:
+    from text_pipeline import chunk_page
+    texts, seed = [], 0
+    while len(texts) < n:
+        texts += [c["content"] for c in chunk_page(make_page(200_000, seed=seed))]
+        seed += 1
+    texts = texts[:n]
+    return texts, np.asarray(embed(texts), dtype=np.float32)
+
+
+def queries(texts: list[str], count: int) -> list[str]:
+    """Questions made of a few words from random chunks, so each has a real best match."""
+    rng = np.random.default_rng(7)
+    out = []
+    for i in rng.integers(0, len(texts), count):
+        words = texts[i].split()
+        start = int(rng.integers(0, max(1, len(words) - 6)))
+        out.append(" ".join(words[start:start + 6]))
+    return out
+
+
+def recall(found: list[list[int]], exact_scores: np.ndarray, k: int) -> float:
+    hits = 0
+    for row, ids in zip(exact_scores, found):
+        kth = np.partition(row, -k)[-k]
+        hits += sum(row[i] >= kth - 1e-6 for i in ids)
+    return hits / (len(found) * k)
+
+
+def per_query_ms(query_vectors: np.ndarray, search) -> float:
+    samples = []
+    for q in query_vectors:
+        t0 = time.perf_counter()
+        search(q)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def list_bytes(vectors: np.ndarray) -> int:
+    """Size of one vector as a list of Python floats, times the corpus."""
+    sample = vectors[0].tolist()
+    return (sys.getsizeof(sample) + sum(sys.getsizeof(x) for x in sample)) * len(vectors)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Float vs int8 two-stage embedding search")
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    ap.add_argument("--shortlists", default="32,64,128")
+    ap.add_argument("--top-k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+    from embedding_service import load_embedding_model
+    from quantization import quantize, approximate_scores, two_stage_search, vector_to_blob
+
+    model = load_embedding_model()
+    embed = lambda texts: model.encode(texts, normalize_embeddings=True)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    texts, all_vectors = corpus(max(sizes), embed)
+    query_vectors = np.asarray(embed(queries(texts, args.queries)), dtype=np.float32)
+    k = args.top_k
+
+    results = []
+    print(f"{'chunks':>7} {'method':>14} {'recall@k':>9} {'ms/query':>9} {'search MB':>10}")
+    for n in sizes:
+        vectors = all_vectors[:n]
+        codes, scales = quantize(vectors)
+
+        exact_scores = query_vectors @ vectors.T
+        exact_ms = per_query_ms(query_vectors, lambda q: np.argsort(-(vectors @ q))[:k])
+        int8_ms = per_query_ms(
+            query_vectors, lambda q: np.argsort(-approximate_scores(q, codes, scales)[0])[:k])
+        int8_only = np.argsort(-approximate_scores(query_vectors, codes, scales), axis=1)[:, :k]
+
+        memory = {
+            "float_lists_mb": round(list_bytes(vectors) / 1e6, 1),
+            "float32_mb": round(vectors.nbytes / 1e6, 2),
+            "int8_mb": round((codes.nbytes + scales.nbytes) / 1e6, 2),
+        }
+        rows = [("float32 exact", 1.0, exact_ms, memory["float32_mb"]),
+                ("int8 only", recall(int8_only.tolist(), exact_scores, k), int8_ms, memory["int8_mb"])]
+        for shortlist in (int(s) for s in args.shortlists.split(",")):
+            search = lambda q: two_stage_search(q, codes, scales, lambda idx: vectors[idx], k, shortlist)[0]
+            found = [[i for i, _ in search(q)] for q in query_vectors]
+            rows.append((f"two-stage {shortlist}", recall(found, exact_scores, k),
+                         per_query_ms(query_vectors, search), memory["int8_mb"]))
+
+        for method, rec, ms, mb in rows:
+            results.append({"chunks": n, "method": method, "recall_at_k": round(rec, 4),
+                            "ms_per_query": round(ms, 3), "search_mb": mb, **memory})
+            print(f"{n:>7} {method:>14} {rec:>9.3f} {ms:>9.3f} {mb:>10}")
+        print(f"{'':>7} float lists (old embed_chunks output): {memory['float_lists_mb']} MB")
+
+    sample = all_vectors[: min(1000, len(all_vectors))]
+    codes, _ = quantize(sample)
+    disk = {
+        "json_bytes": round(statistics.fmean(len(json.dumps(v.tolist())) for v in sample)),
+        "float32_blob_bytes": len(vector_to_blob(sample[0])),
+        "int8_bytes": codes.shape[1] + 8,
+    }
+    print(f"disk per vector: JSON {disk['json_bytes']} B, float32 blob {disk['float32_blob_bytes']} B, "
+          f"int8 + scale {disk['int8_bytes']} B")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"search": results, "disk": disk}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Start main.app for load tests, optionally with the hashing embedder.
+
+    python -m benchmarks.serve --port 8190 [--fake-embeddings]
+
+Point it at fakes with GROQ_API_BASE / TRANSCRIPT_API_URL /
+GOOGLE_DOCS_ENDPOINT / GOOGLE_DRIVE_ENDPOINT (benchmarks.loadtest does this).
+"""
+import argparse
+import os
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the backend for load testing")
+    ap.add_argument("--port", type=int, default=8190)
+    ap.add_argument("--fake-embeddings", action="store_true")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.fake_embeddings:
+        from benchmarks.fakes import install_fake_embeddings
+        install_fake_embeddings()
+
+    import uvicorn
+    import main as backend
+    uvicorn.run(backend.app, host="127.0.0.1", port=args.port, log_level="warning",
+                timeout_keep_alive=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Deterministic synthetic inputs for the benchmarks: web pages of a target
+size and YouTube-style transcripts of a target duration.
+"""
+import random
+
+_WORDS = (
+    "the of and to in is for on with as by at from that this it are be or an was "
+    "model data price system page user video network learning performance memory "
+    "cache query search result process value time index server request response "
+    "design product market review battery screen camera history chapter section "
+    "analysis method training energy policy report article research feature"
+).split()
+
+_NOISE_LINES = [
+    "Retrieved 12 March 2021.",
+    "ISBN 978-0-12-345678-9",
+    "Jump up to: a b",
+    "doi:10.1000/xyz123",
+    "• Home  • About  • Contact",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(8, 24))
+    text = " ".join(words).capitalize() + "."
+    if rng.random() < 0.15:
+        text += f"[{rng.randint(1, 99)}]"
+    return text
+
+
+def make_page(size_bytes: int, seed: int = 0) -> str:
+    """Page text of roughly `size_bytes`, with paragraphs, lists and citation noise."""
+    rng = random.Random(seed * 1_000_003 + size_bytes)
+    parts, total = [], 0
+    while total < size_bytes:
+        roll = rng.random()
+        if roll < 0.1:
+            block = rng.choice(_NOISE_LINES)
+        elif roll < 0.25:
+            block = "\n".join(f"- {_sentence(rng)}" for _ in range(rng.randint(2, 6)))
+        else:
+            block = " ".join(_sentence(rng) for _ in range(rng.randint(2, 8)))
+        parts.append(block)
+        total += len(block.encode()) + 2
+    return "\n\n".join(parts)[:size_bytes]
+
+
+def make_transcript(duration_s: int, seed: int = 0) -> list[dict]:
+    """Caption entries ({text, start, duration}) covering `duration_s` seconds."""
+    rng = random.Random(seed * 1_000_003 + duration_s)
+    entries, t = [], 0.0
+    while t < duration_s:
+        dur = round(rng.uniform(1.5, 5.0), 2)
+        text = " ".join(rng.choices(_WORDS, k=rng.randint(4, 12)))
+        entries.append({"text": text, "start": round(t, 2), "duration": dur})
+        t += dur
+    return entries
+
+
+def parse_size(text: str) -> int:
+    """'1KB' / '5MB' / '2048' → bytes."""
+    text = text.strip().upper()
+    for suffix, mult in (("KB", 1024), ("MB", 1024 ** 2), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[: -len(suffix)]) * mult)
+    return int(text)
+
+
+def parse_duration(text: str) -> int:
+    """'1m' / '5h' / '90s' → seconds."""
+    text = text.strip().lower()
+    for suffix, mult in (("h", 3600), ("m", 60), ("s", 1)):
+        if text.endswith(suffix):
+            return int(float(text[: -len(suffix)]) * mult)
+    return int(text)
@@ -0,0 +1,93 @@
+"""
+Per-domain boilerplate detection for page chunks.
+
+The extension sends a page's full innerText, so every page on a site carries
+the same menus, cookie banners and footers. Those chunks hash the same on
+every page, so a chunk hash seen on BOILERPLATE_MIN_URLS different URLs of
+one domain is treated as boilerplate. rag_service drops it before embedding
+and ranking.
+
+URLs are compared by host + path. Query strings and fragments are dropped, so
+tracking parameters can't make one article look like several pages. Each
+(domain, hash) row keeps at most BOILERPLATE_MIN_URLS URL keys, which bounds
+the table. A URL whose page content hasn't changed since its last visit is not
+recorded again.
+"""
+import hashlib
+import os
+import sqlite3
+from urllib.parse import urlsplit
+
+BOILERPLATE_MIN_URLS = int(os.getenv("BOILERPLATE_MIN_URLS", "3"))
+
+
+def ensure_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS domain_chunks (
+            domain  TEXT NOT NULL,
+            hash    TEXT NOT NULL,
+            urls    TEXT NOT NULL,          -- space-separated URL keys, at most BOILERPLATE_MIN_URLS
+            PRIMARY KEY (domain, hash)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS domain_pages (
+            url_key    TEXT PRIMARY KEY,
+            page_hash  TEXT NOT NULL
+        )
+    """)
+
+
+def split_url(page_url: str) -> tuple[str, str]:
+    """(domain, URL key) for a page URL; ("", "") if it has no host."""
+    parts = urlsplit(page_url.strip())
+    domain = (parts.hostname or "").lower().removeprefix("www.")
+    if not domain:
+        return "", ""
+    key = hashlib.sha256(f"{domain}{parts.path.rstrip('/')}".encode()).hexdigest()[:16]
+    return domain, key
+
+
+def filter_boilerplate(page_url: str, chunks: list[dict], page_hash: str,
+                       conn: sqlite3.Connection) -> tuple[list[dict], int]:
+    """
+    Record this page's chunk hashes for its domain and return
+    (chunks that aren't boilerplate, number excluded). Chunks need a "hash".
+    If every chunk is boilerplate, nothing is excluded.
+    """
+    domain, url_key = split_url(page_url)
+    if not domain or not chunks:
+        return chunks, 0
+    ensure_tables(conn)
+
+    hashes = list(dict.fromkeys(c["hash"] for c in chunks))
+    seen: dict[str, set[str]] = {}
+    for i in range(0, len(hashes), 500):
+        batch = hashes[i:i + 500]
+        for h, urls in conn.execute(
+            f"SELECT hash, urls FROM domain_chunks WHERE domain = ? AND hash IN ({','.join('?' * len(batch))})",
+            [domain, *batch]
+        ):
+            seen[h] = set(urls.split())
+
+    row = conn.execute("SELECT page_hash FROM domain_pages WHERE url_key = ?", (url_key,)).fetchone()
+    if row is None or row[0] != page_hash:
+        updates = []
+        for h in hashes:
+            urls = seen.setdefault(h, set())
+            if url_key not in urls and len(urls) < BOILERPLATE_MIN_URLS:
+                urls.add(url_key)
+                updates.append((domain, h, " ".join(sorted(urls))))
+        conn.executemany(
+            "INSERT OR REPLACE INTO domain_chunks (domain, hash, urls) VALUES (?, ?, ?)", updates
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO domain_pages (url_key, page_hash) VALUES (?, ?)", (url_key, page_hash)
+        )
+        conn.commit()
+
+    boilerplate = {h for h in hashes if len(seen.get(h, ())) >= BOILERPLATE_MIN_URLS}
+    kept = [c for c in chunks if c["hash"] not in boilerplate]
+    if not kept:
+        return chunks, 0
+    return kept, len(chunks) - len(kept)
@@ -0,0 +1,138 @@
+"""
+Token-budgeted context packing for /chat.
+
+The top chunks from rank_chunks repeat text (consecutive chunks overlap by
+~50 chars) and often sit next to each other on the page. pack_context():
+
+  1. merges chunks whose spans overlap or are separated only by whitespace
+     into one block, re-cleaned from the page text so the overlap appears once
+  2. drops sentences that score well below the best sentence of their block
+     against the query (one batch encode for all sentences)
+  3. adds blocks in score order until the model's token budget is spent,
+     cutting the last block at a sentence boundary
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token. This is
+close enough for Llama-family tokenizers on English text, and avoids needing
+the tokenizer here.
+"""
+import os
+import re
+
+import numpy as np
+
+from text_pipeline import clean_text
+
+CHARS_PER_TOKEN = 4
+MODEL_TOKEN_BUDGETS = {
+    "llama-3.1-8b-instant":    1000,
+    "llama-3.3-70b-versatile": 1500,
+}
+DEFAULT_TOKEN_BUDGET = 1000
+SENTENCE_KEEP_RATIO  = float(os.getenv("CONTEXT_SENTENCE_KEEP_RATIO", "0.5"))
+MIN_TAIL_TOKENS      = 40    # don't bother adding a block trimmed below this
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+BLOCK_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def token_budget(model: str) -> int:
+    """Context token budget for `model`; CONTEXT_TOKEN_BUDGET overrides the table."""
+    override = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def merge_chunks(page: str, chunks: list[dict], scores: list[float]) -> list[dict]:
+    """[{start, end, score}] blocks of chunks that overlap or touch on the page."""
+    blocks = []
+    for i in sorted(range(len(chunks)), key=lambda i: chunks[i]["start"]):
+        chunk = chunks[i]
+        last = blocks[-1] if blocks else None
+        if last and (chunk["start"] <= last["end"]
+                     or not page[last["end"]:chunk["start"]].strip()):
+            last["end"] = max(last["end"], chunk["end"])
+            last["score"] = max(last["score"], float(scores[i]))
+        else:
+            blocks.append({"start": chunk["start"], "end": chunk["end"],
+                           "score": float(scores[i])})
+    return blocks
+
+
+def pack_context(page: str, chunks: list[dict], scores: list[float], budget: int,
+                 query_embedding: np.ndarray | None = None, embed=None) -> tuple[str, dict]:
+    """
+    Build the LLM context from ranked chunks (dicts with start/end offsets into
+    `page`). `embed(list[str]) -> normalised vectors` enables sentence
+    filtering. Returns (context, stats).
+    """
+    blocks = merge_chunks(page, chunks, scores)
+    for block in blocks:
+        block["sentences"] = [s for s in _SENTENCE_SPLIT.split(
+            clean_text(page[block["start"]:block["end"]])) if s.strip()]
+
+    dropped = 0
+    if embed is not None and query_embedding is not None:
+        dropped = _drop_weak_sentences(blocks, query_embedding, embed)
+
+    parts, used = [], 0
+    for block in sorted(blocks, key=lambda b: b["score"], reverse=True):
+        text = " ".join(block["sentences"])
+        cost = estimate_tokens(text)
+        if used + cost > budget:
+            room = budget - used
+            if room < MIN_TAIL_TOKENS:
+                continue
+            text = _truncate(text, room * CHARS_PER_TOKEN)
+            cost = estimate_tokens(text)
+            if not text:
+                continue
+        parts.append(text)
+        used += cost
+
+    raw_tokens = sum(estimate_tokens(c["content"]) for c in chunks)
+    return BLOCK_SEPARATOR.join(parts), {
+        "chunks": len(chunks),
+        "blocks": len(parts),
+        "dropped_sentences": dropped,
+        "tokens": used,
+        "raw_tokens": raw_tokens,
+    }
+
+
+def _drop_weak_sentences(blocks: list[dict], query_embedding: np.ndarray, embed) -> int:
+    candidates = [b for b in blocks if len(b["sentences"]) > 2]
+    sentences = [s for b in candidates for s in b["sentences"]]
+    if not sentences:
+        return 0
+    scores = np.asarray(embed(sentences)) @ np.asarray(query_embedding).reshape(-1)
+
+    dropped, pos = 0, 0
+    for block in candidates:
+        n = len(block["sentences"])
+        block_scores = scores[pos:pos + n]
+        pos += n
+        best = float(block_scores.max())
+        if best <= 0:
+            continue   # nothing in this block resembles the query; budget decides
+        floor = best * SENTENCE_KEEP_RATIO
+        kept = [s for s, score in zip(block["sentences"], block_scores) if score >= floor]
+        dropped += n - len(kept)
+        block["sentences"] = kept
+    return dropped
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Longest prefix ≤ max_chars ending at a sentence end, else at a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    cut = max(head.rfind(". "), head.rfind("! "), head.rfind("? "))
+    if cut > 0:
+        return head[:cut + 1]
+    space = head.rfind(" ")
+    return head[:space] if space > 0 else ""
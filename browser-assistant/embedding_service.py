@@ -0,0 +1,297 @@
+"""
+Embedding model access: in-process, or through one shared worker.
+
+By default the SentenceTransformer is loaded inside the API process. With
+EMBEDDING_SOCKET set, API processes never import sentence_transformers;
+they send texts to an embedding worker on that Unix socket instead, so
+running uvicorn with several workers still keeps a single copy of the model:
+
+    python -m embedding_service --socket /tmp/browser-assistant-embed.sock --processes 2
+    EMBEDDING_SOCKET=/tmp/browser-assistant-embed.sock uvicorn main:app --port 8090 --workers 4
+
+The worker coalesces concurrent requests into one encode() batch. With
+--processes N it loads the model once, then forks N-1 more serving
+processes that share the weights copy-on-write and accept on the same
+socket, each limited to cores/N torch threads.
+
+Wire format, both directions: 4-byte big-endian header length, JSON header,
+then an optional payload. Requests are {"texts": [...], "normalize": bool}.
+Responses are {"rows", "dim"} followed by rows*dim float32 values, sent
+straight from the numpy buffer and received straight into one, or {"error"}.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME       = "all-MiniLM-L6-v2"
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "")
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "60"))
+MAX_BATCH        = 256   # texts per coalesced encode() call in the worker
+
+_HEADER = struct.Struct("!I")
+
+
+def load_embedding_model():
+    """The model rag_service/youtube_rag encode with: local, or a worker client."""
+    if EMBEDDING_SOCKET:
+        logger.info("Using embedding worker at %s", EMBEDDING_SOCKET)
+        return RemoteEmbedder(EMBEDDING_SOCKET)
+    return load_local_model()
+
+
+def load_local_model():
+    from sentence_transformers import SentenceTransformer
+    logger.info("Loading embedding model...")
+    model = SentenceTransformer(MODEL_NAME)
+    logger.info("Embedding model ready.")
+    return model
+
+
+# ── Wire helpers ──────────────────────────────────────────────────────────────
+
+def _send(sock: socket.socket, header: dict, payload=None):
+    raw = json.dumps(header).encode()
+    sock.sendall(_HEADER.pack(len(raw)) + raw)
+    if payload is not None and payload.nbytes:
+        sock.sendall(payload)
+
+
+def _recv_into(sock: socket.socket, view: memoryview):
+    got = 0
+    while got < len(view):
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            raise ConnectionError("embedding socket closed")
+        got += n
+
+
+def _bytes_view(arr: np.ndarray) -> memoryview:
+    """Flat byte view of a C-contiguous array, without copying."""
+    return memoryview(arr.reshape(-1).view(np.uint8))
+
+
+def _recv_header(sock: socket.socket, prefix: bytes = b"") -> dict:
+    """Read a length-prefixed JSON header; `prefix` is its first bytes if already read."""
+    size = bytearray(prefix) + bytearray(_HEADER.size - len(prefix))
+    _recv_into(sock, memoryview(size)[len(prefix):])
+    raw = bytearray(_HEADER.unpack(size)[0])
+    _recv_into(sock, memoryview(raw))
+    return json.loads(raw)
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class _StaleConnection(ConnectionError):
+    """The connection failed before the worker sent any reply, so resending is safe."""
+
+
+class RemoteEmbedder:
+    """SentenceTransformer.encode() call shape, served by the embedding worker."""
+
+    def __init__(self, path: str, timeout: float = EMBEDDING_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()   # one persistent connection per thread
+
+    def encode(self, sentences, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        try:
+            out = self._request(texts, normalize_embeddings)
+        except _StaleConnection:
+            # Worker restarted or idle connection dropped: reconnect once.
+            # Timeouts are not retried, or an overloaded worker gets the work twice.
+            out = self._request(texts, normalize_embeddings)
+        return out[0] if single else out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.encode([]).shape[1]
+
+    def _request(self, texts: list[str], normalize: bool) -> np.ndarray:
+        sock = self._connection()
+        try:
+            try:
+                _send(sock, {"texts": texts, "normalize": normalize})
+                first = sock.recv(1)
+            except ConnectionError as e:
+                raise _StaleConnection(str(e)) from e
+            if not first:
+                raise _StaleConnection("embedding socket closed")
+            header = _recv_header(sock, first)
+            if "error" not in header:
+                out = np.empty((header["rows"], header["dim"]), dtype=np.float32)
+                _recv_into(sock, _bytes_view(out))
+        except BaseException:
+            # A timeout or reset can leave the stream mid-message; never reuse it
+            self._close()
+            raise
+        if "error" in header:
+            raise RuntimeError(f"embedding worker: {header['error']}")
+        return out
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+# ── Worker ────────────────────────────────────────────────────────────────────
+
+class _Batcher:
+    """Single encoder thread; requests queued meanwhile are encoded together."""
+
+    def __init__(self, model, max_batch: int = MAX_BATCH):
+        self.model = model
+        self.max_batch = max_batch
+        self.dim = model.get_sentence_embedding_dimension()
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def encode(self, texts: list[str], normalize: bool) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        fut = Future()
+        self._queue.put((texts, normalize, fut))
+        return fut.result()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            count = len(jobs[0][0])
+            while count < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                count += len(job[0])
+
+            for normalize in (True, False):
+                group = [job for job in jobs if job[1] is normalize]
+                if group:
+                    self._encode_group(group, normalize)
+
+    def _encode_group(self, group: list, normalize: bool):
+        texts = [t for job in group for t in job[0]]
+        try:
+            vectors = np.asarray(
+                self.model.encode(texts, normalize_embeddings=normalize), dtype=np.float32
+            )
+        except Exception as e:
+            for _, _, fut in group:
+                fut.set_exception(e)
+            return
+        start = 0
+        for job_texts, _, fut in group:
+            fut.set_result(vectors[start:start + len(job_texts)])
+            start += len(job_texts)
+
+
+def _handle(conn: socket.socket, batcher: _Batcher):
+    with conn:
+        while True:
+            try:
+                request = _recv_header(conn)
+            except (ConnectionError, OSError):
+                return
+            try:
+                vectors = np.ascontiguousarray(
+                    batcher.encode(request["texts"], bool(request.get("normalize"))),
+                    dtype=np.float32,
+                )
+            except Exception as e:
+                logger.exception("Encode failed")
+                _send(conn, {"error": str(e)})
+                continue
+            _send(conn, {"rows": vectors.shape[0], "dim": vectors.shape[1]},
+                  _bytes_view(vectors))
+
+
+def _serve_forever(server: socket.socket, model, processes: int):
+    _limit_threads(processes)
+    batcher = _Batcher(model)
+    logger.info("Embedding worker %d serving", os.getpid())
+    while True:
+        conn, _ = server.accept()
+        threading.Thread(target=_handle, args=(conn, batcher), daemon=True).start()
+
+
+def _limit_threads(processes: int):
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // processes))
+
+
+def _interrupt(*_):
+    raise KeyboardInterrupt
+
+
+def serve(path: str, processes: int = 1, model=None):
+    """Run the embedding worker on a Unix socket until interrupted."""
+    model = model or load_local_model()
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(128)
+
+    # Fork before any encode() so no torch thread pool exists yet
+    children = []
+    for _ in range(processes - 1):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _serve_forever(server, model, processes)
+            os._exit(0)
+        children.append(pid)
+
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        _serve_forever(server, model, processes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared embedding worker")
+    ap.add_argument("--socket", default=EMBEDDING_SOCKET or "/tmp/browser-assistant-embed.sock")
+    ap.add_argument("--processes", type=int, default=1,
+                    help="serving processes sharing one loaded model")
+    args = ap.parse_args()
+    import observability  # noqa: F401  (logging setup)
+    serve(args.socket, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,22 @@ Color scheme:
   Footer:   Light gray  #828296
   Body:     Dark        #1E1E2E
 """
+import logging
+import os
+import queue
 import re
+import threading
+import time
+import uuid
 from pathlib import Path
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
+from observability import stage
+
 SCOPES = [
     "https://www.googleapis.com/auth/documents",
     "https://www.googleapis.com/auth/drive.file",
@@ -29,6 +38,15 @@ BASE_DIR = Path(__file__).parent
 CLIENT_SECRET_FILE = BASE_DIR / "google_client_secret.json"
 TOKEN_FILE = BASE_DIR / "google_token.json"
 
+# Point both APIs at a local fake (e.g. http://127.0.0.1:9100) for tests and
+# load runs; no OAuth is attempted when these are set.
+DOCS_ENDPOINT  = os.getenv("GOOGLE_DOCS_ENDPOINT")
+DRIVE_ENDPOINT = os.getenv("GOOGLE_DRIVE_ENDPOINT")
+
+EXPORT_JOB_TTL = 3600   # seconds a finished export stays pollable
+
+logger = logging.getLogger(__name__)
+
 # ── Color helpers ──────────────────────────────────────────────────────────────
 
 def _rgb(r: int, g: int, b: int) -> dict:
@@ -44,24 +62,58 @@ COLOR_BODY    = _rgb(30,  30,  46)    # near-black
 
 # ── Auth ───────────────────────────────────────────────────────────────────────
 
+_creds: Credentials | None = None
+_creds_lock = threading.Lock()
+_clients = threading.local()   # discovery-built services are not thread-safe
+
+
 def _get_credentials() -> Credentials:
-    creds = None
-    if TOKEN_FILE.exists():
-        creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    """Process-wide credentials: read from disk once, refreshed in place when expired."""
+    global _creds
+    with _creds_lock:
+        if _creds and _creds.valid:
+            return _creds
+        creds = _creds
+        if creds is None and TOKEN_FILE.exists():
+            creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                if not CLIENT_SECRET_FILE.exists():
+                    raise FileNotFoundError(
+                        f"Google OAuth client secret not found at: {CLIENT_SECRET_FILE}\n"
+                        "Download from Google Cloud Console → APIs & Services → Credentials "
+                        "→ OAuth 2.0 Client IDs → Download JSON, rename to 'google_client_secret.json'."
+                    )
+                flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRET_FILE), SCOPES)
+                creds = flow.run_local_server(port=8085)
+            TOKEN_FILE.write_text(creds.to_json())
+        _creds = creds
+        return creds
+
+
+def _get_services():
+    """
+    (docs, drive) clients, built once per thread and reused. They share the
+    cached credentials object, so a token refresh is picked up automatically.
+    """
+    if getattr(_clients, "docs", None) is None:
+        if DOCS_ENDPOINT or DRIVE_ENDPOINT:
+            creds = AnonymousCredentials()
         else:
-            if not CLIENT_SECRET_FILE.exists():
-                raise FileNotFoundError(
-                    f"Google OAuth client secret not found at: {CLIENT_SECRET_FILE}\n"
-                    "Download from Google Cloud Console → APIs & Services → Credentials "
-                    "→ OAuth 2.0 Client IDs → Download JSON, rename to 'google_client_secret.json'."
-                )
-            flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRET_FILE), SCOPES)
-            creds = flow.run_local_server(port=8085)
-        TOKEN_FILE.write_text(creds.to_json())
-    return creds
+            creds = _get_credentials()
+        _clients.docs = build(
+            "docs", "v1", credentials=creds, cache_discovery=False,
+            client_options={"api_endpoint": DOCS_ENDPOINT} if DOCS_ENDPOINT else None,
+        )
+        _clients.drive = build(
+            "drive", "v3", credentials=creds, cache_discovery=False,
+            client_options={"api_endpoint": DRIVE_ENDPOINT} if DRIVE_ENDPOINT else None,
+        )
+    elif not (DOCS_ENDPOINT or DRIVE_ENDPOINT):
+        _get_credentials()   # refresh the shared token if it has expired
+    return _clients.docs, _clients.drive
 
 
 # ── Document Builder ───────────────────────────────────────────────────────────
@@ -268,9 +320,7 @@ def create_google_doc(title: str, summary_md: str, source_url: str = "") -> str:
     Create a richly formatted Google Doc from a markdown summary.
     Returns the Google Docs edit URL.
     """
-    creds = _get_credentials()
-    docs_service = build("docs", "v1", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
+    docs_service, drive_service = _get_services()
 
     # Create blank document
     doc = docs_service.documents().create(body={"title": title}).execute()
@@ -292,3 +342,63 @@ def create_google_doc(title: str, summary_md: str, source_url: str = "") -> str:
     ).execute()
 
     return f"https://docs.google.com/document/d/{doc_id}/edit"
+
+
+# ── Background export queue ────────────────────────────────────────────────────
+# Summarize endpoints return as soon as the LLM answers; the doc is created by a
+# single worker thread (which keeps its own cached clients) and the extension
+# polls get_export(export_id) for the URL.
+
+_export_queue: "queue.Queue[tuple[str, str, str, str]]" = queue.Queue()
+_export_jobs: dict[str, dict] = {}
+_export_lock = threading.Lock()
+_export_worker: threading.Thread | None = None
+
+
+def enqueue_google_doc(title: str, summary_md: str, source_url: str = "") -> str:
+    """Queue a doc export and return its export_id immediately."""
+    global _export_worker
+    export_id = uuid.uuid4().hex
+    with _export_lock:
+        _prune_exports()
+        _export_jobs[export_id] = {"status": "pending", "doc_url": "", "error": "",
+                                   "finished_at": None}
+        if _export_worker is None or not _export_worker.is_alive():
+            _export_worker = threading.Thread(target=_export_loop, name="gdocs-export",
+                                              daemon=True)
+            _export_worker.start()
+    _export_queue.put((export_id, title, summary_md, source_url))
+    return export_id
+
+
+def get_export(export_id: str) -> dict:
+    """Status of a queued export: pending | done | failed, plus doc_url / error."""
+    with _export_lock:
+        job = _export_jobs.get(export_id)
+        if not job:
+            return {"status": "unknown", "doc_url": "", "error": "Unknown export id"}
+        return {k: job[k] for k in ("status", "doc_url", "error")}
+
+
+def _export_loop():
+    while True:
+        export_id, title, summary_md, source_url = _export_queue.get()
+        try:
+            with stage("gdocs_export"):
+                doc_url = create_google_doc(title, summary_md, source_url=source_url)
+            update = {"status": "done", "doc_url": doc_url}
+            logger.info("Export %s done: %s", export_id[:8], doc_url)
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+            logger.error("Export %s failed: %s", export_id[:8], e)
+        with _export_lock:
+            if export_id in _export_jobs:
+                _export_jobs[export_id].update(update, finished_at=time.monotonic())
+        _export_queue.task_done()
+
+
+def _prune_exports():
+    cutoff = time.monotonic() - EXPORT_JOB_TTL
+    for export_id in [k for k, j in _export_jobs.items()
+                      if j["finished_at"] is not None and j["finished_at"] < cutoff]:
+        del _export_jobs[export_id]
@@ -0,0 +1,192 @@
+"""
+Admission control for LLM calls.
+
+Every get_answer() call takes a slot from one process-wide controller:
+
+  - at most LLM_MAX_CONCURRENCY calls run at once, and background calls
+    (summaries) may hold at most LLM_BACKGROUND_MAX of those slots, so a burst
+    of summarize clicks can't take every slot from interactive chat
+  - one /chat/batch request runs at most LLM_BATCH_CONCURRENCY of its calls
+    at once (default: the slots background calls can't take), so a large
+    batch leaves slots free for other users' chat
+  - estimated tokens over the last minute stay under LLM_TOKENS_PER_MINUTE
+    (0 = no limit), to stay inside the Groq rate limit instead of hitting it
+  - waiting calls are admitted in priority order: interactive first, then
+    background, FIFO within each class
+  - once a class already has LLM_QUEUE_LIMIT_<CLASS> callers waiting, new
+    ones fail fast. So do callers that wait longer than that class's timeout.
+    Both raise LLMBusy with a retry_after hint, which main.py turns into a
+    429 response.
+
+Queue wait, queue depth, in-flight calls and rejections are exported on /metrics.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from observability import stage, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_REJECTED
+
+INTERACTIVE = "interactive"
+BACKGROUND  = "background"
+_RANK = {INTERACTIVE: 0, BACKGROUND: 1}
+
+LLM_MAX_CONCURRENCY   = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_BACKGROUND_MAX    = int(os.getenv("LLM_BACKGROUND_MAX", max(1, LLM_MAX_CONCURRENCY // 2)))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY",
+                                      max(1, LLM_MAX_CONCURRENCY - LLM_BACKGROUND_MAX)))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.getenv("LLM_QUEUE_LIMIT_INTERACTIVE", "32")),
+    BACKGROUND:  int(os.getenv("LLM_QUEUE_LIMIT_BACKGROUND", "4")),
+}
+QUEUE_TIMEOUTS = {
+    INTERACTIVE: float(os.getenv("LLM_QUEUE_TIMEOUT_INTERACTIVE", "20")),
+    BACKGROUND:  float(os.getenv("LLM_QUEUE_TIMEOUT_BACKGROUND", "60")),
+}
+
+
+class LLMBusy(Exception):
+    """The LLM queue is full or the wait timed out; retry after `retry_after` seconds."""
+
+    def __init__(self, priority: str, reason: str, retry_after: int):
+        super().__init__(f"LLM {priority} queue {reason}, retry in {retry_after}s")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 background_max: int = LLM_BACKGROUND_MAX,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 queue_limits: dict | None = None, queue_timeouts: dict | None = None):
+        self.max_concurrency = max_concurrency
+        self.background_max = min(background_max, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_limits = queue_limits or QUEUE_LIMITS
+        self.queue_timeouts = queue_timeouts or QUEUE_TIMEOUTS
+
+        self._cond = threading.Condition()
+        self._heap: list[tuple[int, int, str]] = []   # (rank, seq, priority)
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._active = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._window: deque[tuple[float, int]] = deque()   # (admitted_at, tokens), last 60 s
+        self._seq = itertools.count()
+        self._avg_call_s = 2.0   # EWMA of call duration, for retry hints
+
+    def slot(self, priority: str, tokens: int) -> "_Slot":
+        """Context manager: block until admitted, release on exit."""
+        return _Slot(self, priority, tokens)
+
+    def acquire(self, priority: str, tokens: int):
+        t0 = time.monotonic()
+        with self._cond:
+            if self._waiting[priority] >= self.queue_limits[priority]:
+                LLM_REJECTED.inc(priority=priority, reason="queue_full")
+                raise LLMBusy(priority, "full", self._retry_hint(priority, tokens))
+
+            entry = (_RANK[priority], next(self._seq), priority)
+            heapq.heappush(self._heap, entry)
+            self._set_waiting(priority, +1)
+            deadline = t0 + self.queue_timeouts[priority]
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._admissible(entry, tokens, now)
+                    if wait == 0:
+                        break
+                    if now >= deadline:
+                        LLM_REJECTED.inc(priority=priority, reason="timeout")
+                        raise LLMBusy(priority, "wait timed out", self._retry_hint(priority, tokens))
+                    self._cond.wait(min(wait, deadline - now))
+            except BaseException:
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                self._set_waiting(priority, -1)
+                self._cond.notify_all()
+                raise
+
+            self._heap.remove(entry)
+            heapq.heapify(self._heap)
+            self._set_waiting(priority, -1)
+            self._active[priority] += 1
+            LLM_IN_FLIGHT.set(sum(self._active.values()))
+            if self.tokens_per_minute:
+                self._window.append((time.monotonic(), tokens))
+            self._cond.notify_all()   # the next entry in line may be admissible too
+        LLM_QUEUE_WAIT.observe(time.monotonic() - t0, priority=priority)
+
+    def release(self, priority: str, duration: float):
+        with self._cond:
+            self._active[priority] -= 1
+            self._avg_call_s = 0.8 * self._avg_call_s + 0.2 * duration
+            LLM_IN_FLIGHT.set(sum(self._active.values()))
+            self._cond.notify_all()
+
+    # ── internals (hold self._cond) ───────────────────────────────────────────
+
+    def _admissible(self, entry: tuple, tokens: int, now: float) -> float:
+        """0 if `entry` may start now, else how long to wait before re-checking."""
+        priority = entry[2]
+        if sum(self._active.values()) >= self.max_concurrency:
+            return self.queue_timeouts[priority]            # woken by release()
+        if priority == BACKGROUND and self._active[BACKGROUND] >= self.background_max:
+            return self.queue_timeouts[priority]
+        # Strict priority: only the best waiting entry that can use a slot goes next
+        for other in sorted(self._heap):
+            if other is entry:
+                break
+            if other[2] == INTERACTIVE or self._active[BACKGROUND] < self.background_max:
+                return self.queue_timeouts[priority]
+        return self._token_wait(tokens, now)
+
+    def _token_wait(self, tokens: int, now: float) -> float:
+        if not self.tokens_per_minute:
+            return 0
+        while self._window and self._window[0][0] <= now - 60:
+            self._window.popleft()
+        used = sum(t for _, t in self._window)
+        if not self._window or used + tokens <= self.tokens_per_minute:
+            return 0
+        # Wait until enough of the window expires
+        freed = 0
+        for admitted_at, t in self._window:
+            freed += t
+            if used - freed + tokens <= self.tokens_per_minute:
+                return max(0.01, admitted_at + 60 - now)
+        return max(0.01, self._window[-1][0] + 60 - now)
+
+    def _retry_hint(self, priority: str, tokens: int) -> int:
+        ahead = len(self._heap) if priority == BACKGROUND else self._waiting[INTERACTIVE]
+        slots = self.background_max if priority == BACKGROUND else self.max_concurrency
+        hint = (ahead / max(1, slots) + 1) * self._avg_call_s
+        if self.tokens_per_minute:
+            hint = max(hint, self._token_wait(tokens, time.monotonic()))
+        return max(1, math.ceil(hint))
+
+    def _set_waiting(self, priority: str, delta: int):
+        self._waiting[priority] += delta
+        LLM_QUEUE_DEPTH.set(self._waiting[priority], priority=priority)
+
+
+class _Slot:
+    def __init__(self, controller: AdmissionController, priority: str, tokens: int):
+        self.controller = controller
+        self.priority = priority
+        self.tokens = tokens
+
+    def __enter__(self):
+        with stage("llm_queue"):
+            self.controller.acquire(self.priority, self.tokens)
+        self._t0 = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.controller.release(self.priority, time.monotonic() - self._t0)
+
+
+admission = AdmissionController()
@@ -0,0 +1,221 @@
+"""
+LLM client: pooled connections, deadlines, retries and optional hedging.
+
+    client = LLMClient(GroqBackend())
+    text = client.complete([{"role": "user", "content": "..."}])
+
+A backend performs one chat completion. GroqBackend speaks the
+OpenAI-compatible API over one keep-alive httpx connection pool, so
+GROQ_API_BASE can point it at benchmarks.fake_services (or any compatible
+server). Tests can also pass their own LLMBackend.
+
+LLMClient.complete():
+  - has one deadline for the whole call (LLM_DEADLINE seconds), and no
+    attempt runs past it
+  - retries timeouts, connection errors, 429 and 5xx up to LLM_RETRIES times,
+    with exponential backoff and full jitter (a 429 Retry-After is honoured
+    when it fits in the deadline)
+  - with LLM_HEDGE=1, fires a second identical request when the first hasn't
+    returned within the p95 of recent call latencies and takes whichever
+    succeeds first. A hedge is an extra upstream request that the admission
+    token budget doesn't see, so enable it only with rate-limit headroom.
+Raises LLMError when the deadline passes or an error isn't retryable.
+"""
+import collections
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+from observability import LLM_ATTEMPTS, LLM_HEDGES
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com").rstrip("/")
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "8"))
+
+BACKOFF_BASE = 0.25   # seconds; attempt n sleeps uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**n))
+BACKOFF_CAP = 4.0
+
+
+class LLMError(Exception):
+    """The LLM call failed: deadline passed, retries exhausted, or a non-retryable error."""
+
+
+class AttemptError(Exception):
+    """One backend attempt failed."""
+
+    def __init__(self, message: str, retryable: bool, retry_after: float | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMBackend(ABC):
+    """One chat completion within `timeout` seconds; raises AttemptError on failure."""
+
+    @abstractmethod
+    def complete(self, messages: list[dict], timeout: float) -> str:
+        ...
+
+    def close(self):
+        pass
+
+
+class GroqBackend(LLMBackend):
+    """OpenAI-compatible /chat/completions over a shared keep-alive connection pool."""
+
+    def __init__(self, model: str = "llama-3.1-8b-instant", base_url: str = GROQ_API_BASE,
+                 api_key: str | None = None, pool_size: int = LLM_POOL_SIZE,
+                 temperature: float = 0.7, transport: httpx.BaseTransport | None = None):
+        self.model = model
+        self.temperature = temperature   # ChatGroq's default, which answers were tuned with
+        self._client = httpx.Client(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key or os.getenv('GROQ_API_KEY', '')}"},
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                keepalive_expiry=60),
+            transport=transport,
+        )
+
+    def complete(self, messages: list[dict], timeout: float) -> str:
+        try:
+            resp = self._client.post(
+                "/openai/v1/chat/completions",
+                json={"model": self.model, "messages": messages,
+                      "temperature": self.temperature},
+                timeout=timeout,
+            )
+        except httpx.TimeoutException as e:
+            raise AttemptError(f"timeout: {e!r}", retryable=True)
+        except httpx.TransportError as e:
+            raise AttemptError(f"connection error: {e!r}", retryable=True)
+
+        if resp.status_code == 429 or resp.status_code >= 500:
+            retry_after = resp.headers.get("retry-after")
+            raise AttemptError(
+                f"HTTP {resp.status_code}", retryable=True,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if resp.status_code != 200:
+            raise AttemptError(f"HTTP {resp.status_code}: {resp.text[:200]}", retryable=False)
+        try:
+            return resp.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise AttemptError(f"malformed response: {e!r}: {resp.text[:200]}", retryable=False)
+
+    def close(self):
+        self._client.close()
+
+
+class LLMClient:
+    def __init__(self, backend: LLMBackend, deadline: float = LLM_DEADLINE,
+                 retries: int = LLM_RETRIES, hedge: bool = LLM_HEDGE,
+                 hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        self.backend = backend
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies: collections.deque[float] = collections.deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._pool = (ThreadPoolExecutor(max_workers=2 * LLM_POOL_SIZE, thread_name_prefix="llm")
+                      if hedge else None)
+
+    def complete(self, messages: list[dict], deadline: float | None = None) -> str:
+        end = time.monotonic() + (deadline or self.deadline)
+        last: AttemptError | None = None
+        for attempt in range(self.retries + 1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return self._hedged(messages, end) if self.hedge else self._attempt(messages, end)
+            except AttemptError as e:
+                last = e
+                if not e.retryable:
+                    raise LLMError(str(e)) from e
+            if attempt == self.retries:
+                break
+            pause = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if last.retry_after is not None:
+                pause = max(pause, last.retry_after)
+            if time.monotonic() + pause >= end:
+                break
+            logger.warning("LLM attempt %d failed (%s), retrying in %.2fs", attempt + 1, last, pause)
+            time.sleep(pause)
+        raise LLMError(f"LLM call failed after {attempt + 1} attempt(s): {last or 'deadline exceeded'}")
+
+    def hedge_delay(self) -> float | None:
+        """p95 of recent successful attempts, or None until there are enough samples."""
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self.backend.close()
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    def _attempt(self, messages: list[dict], end: float, record: bool = True) -> str:
+        t0 = time.monotonic()
+        timeout = end - t0
+        if timeout <= 0:
+            raise AttemptError("deadline exceeded", retryable=False)
+        try:
+            text = self.backend.complete(messages, timeout)
+        except AttemptError as e:
+            LLM_ATTEMPTS.inc(outcome="retryable" if e.retryable else "failed")
+            raise
+        LLM_ATTEMPTS.inc(outcome="ok")
+        if record:
+            self._record(time.monotonic() - t0)
+        return text
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _hedged(self, messages: list[dict], end: float) -> str:
+        # Latency samples are what the caller saw (first success), not each leg,
+        # or the losing stragglers would drag the p95 up to their own latency.
+        delay = self.hedge_delay()
+        t0 = time.monotonic()
+        primary = self._pool.submit(self._attempt, messages, end, False)
+        if delay is None or delay >= end - t0:
+            text = primary.result()
+            self._record(time.monotonic() - t0)
+            return text
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            text = primary.result()
+            self._record(time.monotonic() - t0)
+            return text
+        LLM_HEDGES.inc(result="fired")
+        hedge = self._pool.submit(self._attempt, messages, end, False)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        LLM_HEDGES.inc(result="won")
+                    self._record(time.monotonic() - t0)
+                    return future.result()
+                error = future.exception()
+        raise error
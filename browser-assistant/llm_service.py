@@ -1,15 +1,18 @@
 import os
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from dotenv import load_dotenv
 
-load_dotenv()
+from context_packer import estimate_tokens
+from llm_admission import admission, INTERACTIVE
+from llm_client import LLMClient, GroqBackend
+from observability import stage
 
-llm = ChatGroq(
-    model_name="llama-3.1-8b-instant",
-)
+MODEL_NAME = "llama-3.1-8b-instant"
 
-prompt = ChatPromptTemplate.from_template("""
+# One client per process: keep-alive connections to Groq (or GROQ_API_BASE),
+# deadlines, retries and optional hedging (see llm_client). Tests may replace
+# it with LLMClient(<their own LLMBackend>).
+client = LLMClient(GroqBackend(MODEL_NAME, api_key=os.getenv("GROQ_API_KEY")))
+
+PROMPT_TEMPLATE = """
 You are an AI assistant helping user understand a webpage.
 
 Current Webpage Content:
@@ -23,12 +26,22 @@ Answer clearly and accurately based ONLY on the page content.
 Never answer if related answer is not present in context, say i cant find answer in this webpage.
 
 Always answer in Markdown formate.
-""")
-
-def get_answer(context: str, question: str) -> str:
-    chain = prompt | llm
-    response = chain.invoke({
-        "context": context,  # avoid overflow
-        "question": question
-    })
-    return response.content
\ No newline at end of file
+"""
+
+# Rough per-call token cost for the tokens-per-minute budget
+PROMPT_TEMPLATE_TOKENS = 80
+OUTPUT_TOKENS_ESTIMATE = 400
+
+
+def get_answer(context: str, question: str, priority: str = INTERACTIVE) -> str:
+    """
+    Ask the LLM. Waits for an admission slot first (see llm_admission);
+    raises LLMBusy when the queue for `priority` is full or the wait times out,
+    and LLMError when the call fails or misses its deadline.
+    """
+    tokens = (estimate_tokens(context) + estimate_tokens(question)
+              + PROMPT_TEMPLATE_TOKENS + OUTPUT_TOKENS_ESTIMATE)
+    content = PROMPT_TEMPLATE.format(context=context, question=question)
+    with admission.slot(priority, tokens):
+        with stage("llm"):
+            return client.complete([{"role": "user", "content": content}])
@@ -1,19 +1,54 @@
+from dotenv import load_dotenv
+load_dotenv()   # first: modules below read their settings from the environment at import
+
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from models import ChatRequest, ChatResponse, SummarizeRequest, SummarizeResponse
-from rag_service import process_page_and_query, find_best_source
-from llm_service import get_answer
-from price_service import record_price, get_price_history
-from gdocs_service import create_google_doc
+from fastapi.responses import JSONResponse, PlainTextResponse
+from observability import begin_request, end_request, render_metrics, HTTP_LATENCY
+from models import ChatRequest, ChatResponse, ChatBatchRequest, ChatBatchResponse, SummarizeRequest, SummarizeResponse
+from rag_service import process_page_and_query, process_page_and_queries, find_best_source, find_best_sources
+import llm_service
+from llm_service import get_answer, MODEL_NAME
+from llm_client import LLMError
+from llm_admission import LLMBusy, BACKGROUND, LLM_BATCH_CONCURRENCY
+from context_packer import token_budget
+from price_service import record_price, record_prices, get_price_history, get_price_histories
+from gdocs_service import enqueue_google_doc, get_export
+from price_refresher import PriceRefresher, REFRESH_INTERVAL, claim_refresher
 from youtube_service import extract_video_id, fetch_transcript, build_timed_chunks, format_timestamp
-from youtube_rag import store_youtube_chunks, query_youtube
+from youtube_rag import store_youtube_chunks, query_youtube, query_youtube_batch
+import text_pipeline
+from singleflight import SingleFlight
+from text_pipeline import compute_hash
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import httpx
+import logging
 import re
+import time
 import uvicorn
 
-app = FastAPI()
+logger = logging.getLogger("main")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresher = None
+    if REFRESH_INTERVAL > 0:
+        if claim_refresher():
+            refresher = PriceRefresher()
+            refresher.start(REFRESH_INTERVAL)
+        else:
+            logger.info("Price refresher runs in another worker")
+    yield
+    text_pipeline.shutdown_pool()
+    llm_service.client.close()
+    if refresher:
+        await refresher.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,26 +56,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Per-request latency histogram + Server-Timing header with the stage breakdown."""
+    token = begin_request()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(elapsed, method=request.method,
+                         path=route.path if route else "unmatched",
+                         status=response.status_code)
+    response.headers["Server-Timing"] = end_request(token, elapsed)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+
+@app.exception_handler(LLMBusy)
+async def llm_busy_handler(request: Request, exc: LLMBusy):
+    """LLM admission queue full or wait timed out: 429 with a retry hint."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    """Upstream LLM failed after retries or missed its deadline."""
+    logger.warning("LLM call failed: %s", exc)
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(data: ChatRequest):
+def chat(data: ChatRequest):
     raw_context = data.context or ""
     if not raw_context.strip():
         return ChatResponse(answer="I couldn't read any content from this page.")
-    relevant_context, source_chunks = process_page_and_query(
+    relevant_context, source_chunks, source_spans = process_page_and_query(
         page_content=raw_context,
         query=data.message,
-        top_k=10
+        top_k=10,
+        token_budget=token_budget(MODEL_NAME),
+        page_url=data.page_url,
+        tab_id=data.tab_id,
     )
-    print(f"[CHAT] Sending {len(relevant_context)} chars of context to LLM")
+    logger.info("Sending %d chars of context to LLM", len(relevant_context))
     answer = get_answer(relevant_context, data.message)
     best_idx = find_best_source(answer, source_chunks)
-    for s in source_chunks:
-        print(f"Sources: {s}")
-    print(f"\nBest source: {source_chunks[best_idx]}")
-    return ChatResponse(answer=answer, sources=source_chunks, best_source_idx=best_idx)  # ← return sources
+    return ChatResponse(answer=answer, sources=source_chunks, best_source_idx=best_idx,
+                        source_spans=source_spans)
 
 
 # ── Price Tracking ──────────────────────────────────────────────────────────
@@ -55,10 +131,26 @@ class PriceTrackRequest(BaseModel):
 async def track_price(data: PriceTrackRequest):
     return record_price(data.url, data.title, data.price, data.image_url)
 
+class PriceTrackBatchRequest(BaseModel):
+    items: list[PriceTrackRequest]
+
+class PriceHistoryBatchRequest(BaseModel):
+    urls: list[str]
+
+@app.post("/track-prices")
+async def track_prices(data: PriceTrackBatchRequest):
+    """Record many products in one transaction (watchlist refresh)."""
+    return record_prices([item.model_dump() for item in data.items])
+
 @app.get("/price-history")
 async def price_history(url: str):
     return get_price_history(url)
 
+@app.post("/price-histories")
+async def price_histories(data: PriceHistoryBatchRequest):
+    """Stats for many products at once, keyed by URL."""
+    return get_price_histories(data.urls)
+
 
 # ── YouTube ─────────────────────────────────────────────────────────────────
 
@@ -71,10 +163,10 @@ class YouTubeChatRequest(BaseModel):
 
 
 @app.post("/youtube/load")
-async def youtube_load(data: YouTubeLoadRequest):
+def youtube_load(data: YouTubeLoadRequest):
     """Extract transcript, chunk it, embed & store. Called when user opens YT video."""
     video_id = extract_video_id(data.url)
-    print(f"Video Id : {video_id}")
+    logger.info("Loading YouTube video %s", video_id)
     if not video_id:
         return {"success": False, "error": "Not a valid YouTube URL"}
 
@@ -100,33 +192,17 @@ async def youtube_load(data: YouTubeLoadRequest):
 
 
 @app.post("/youtube/chat")
-async def youtube_chat(data: YouTubeChatRequest):
+def youtube_chat(data: YouTubeChatRequest):
     """Answer a question about a YouTube video using timed transcript chunks."""
     top_chunks = query_youtube(data.video_id, data.message, top_k=10)
-    print(f"Query : {data.message} \n\nTop Message: {top_chunks}")
+    logger.debug("YouTube query %r matched %d chunks", data.message, len(top_chunks))
     if not top_chunks:
         return {
             "answer":    "I don't have the transcript for this video loaded yet.",
             "timelines": []
         }
 
-    # Build context with timestamps embedded
-    context_parts = []
-    for chunk in top_chunks:
-        context_parts.append(f"[{chunk['ts_label']}] {chunk['text']}")
-    context = "\n\n".join(context_parts)
-
-    # Ask LLM
-    prompt = f"""You are answering questions about a YouTube video based on its transcript.
-The transcript excerpts below include timestamps in [MM:SS] format.
-When answering, mention the relevant timestamps naturally.
-
-Transcript excerpts:
-{context}
-
-Question: {data.message}"""
-
-    answer = get_answer("", prompt)   # pass prompt directly as message
+    answer = get_answer("", _youtube_prompt(top_chunks, data.message))   # pass prompt directly as message
 
     # Build timeline markers
     timelines = [
@@ -142,6 +218,89 @@ Question: {data.message}"""
     return {"answer": answer, "timelines": timelines}
 
 
+def _youtube_prompt(top_chunks: list[dict], question: str) -> str:
+    # Build context with timestamps embedded
+    context_parts = []
+    for chunk in top_chunks:
+        context_parts.append(f"[{chunk['ts_label']}] {chunk['text']}")
+    context = "\n\n".join(context_parts)
+
+    return f"""You are answering questions about a YouTube video based on its transcript.
+The transcript excerpts below include timestamps in [MM:SS] format.
+When answering, mention the relevant timestamps naturally.
+
+Transcript excerpts:
+{context}
+
+Question: {question}"""
+
+
+# ── Batch Questions ─────────────────────────────────────────────────────────
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+def chat_batch(data: ChatBatchRequest):
+    """
+    Many questions about one page (context) or one loaded video (video_id).
+    Retrieval runs once for all questions; the LLM calls run concurrently,
+    at most LLM_BATCH_CONCURRENCY at a time, each taking an interactive slot.
+    """
+    if data.video_id:
+        matches = query_youtube_batch(data.video_id, data.questions, top_k=10)
+        if not matches[0]:
+            return ChatBatchResponse(results=[
+                ChatResponse(answer="I don't have the transcript for this video loaded yet.")
+                for _ in data.questions])
+        prompts = [("", _youtube_prompt(m, q)) for m, q in zip(matches, data.questions)]
+        sources = [[c["text"] for c in m] for m in matches]
+        spans = [[] for _ in data.questions]
+    else:
+        raw_context = data.context or ""
+        if not raw_context.strip():
+            return ChatBatchResponse(results=[
+                ChatResponse(answer="I couldn't read any content from this page.")
+                for _ in data.questions])
+        retrieved = process_page_and_queries(raw_context, data.questions, top_k=10,
+                                             token_budget=token_budget(MODEL_NAME),
+                                             page_url=data.page_url, tab_id=data.tab_id)
+        prompts = [(context, q) for (context, _, _), q in zip(retrieved, data.questions)]
+        sources = [chunks for _, chunks, _ in retrieved]
+        spans = [s for _, _, s in retrieved]
+
+    logger.info("Batch of %d questions", len(data.questions))
+    answers = _answer_all(prompts)
+    best = find_best_sources(answers, sources)
+    return ChatBatchResponse(results=[
+        ChatResponse(answer=a, sources=src, best_source_idx=b, source_spans=sp)
+        for a, src, b, sp in zip(answers, sources, best, spans)
+    ])
+
+
+def _answer_all(prompts: list[tuple[str, str]]) -> list[str]:
+    """get_answer for each (context, question) concurrently, in order. Any LLMBusy fails the batch."""
+    # Capped below the global limit so one batch can't hold every slot
+    pool = ThreadPoolExecutor(max_workers=min(len(prompts), LLM_BATCH_CONCURRENCY))
+    try:
+        # copy_context so each call's stage timings land in this request's Server-Timing
+        futures = [pool.submit(contextvars.copy_context().run, get_answer, context, question)
+                   for context, question in prompts]
+        return [f.result() for f in futures]
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+# ── Summaries ───────────────────────────────────────────────────────────────
+
+_summary_flights = SingleFlight("summarize")
+
+
+def _summarize_and_export(prompt: str, doc_title: str, source_url: str) -> tuple[str, str]:
+    """LLM summary + queued Google Doc. Identical concurrent requests share both."""
+    summary_text = get_answer("", prompt, priority=BACKGROUND)
+    # Richly formatted Google Doc is created in the background
+    logger.info("Queueing Google Doc: %s", doc_title)
+    return summary_text, enqueue_google_doc(doc_title, summary_text, source_url=source_url)
+
+
 # ── YouTube Summarize to Google Docs ────────────────────────────────────────
 
 class YouTubeSummarizeRequest(BaseModel):
@@ -150,7 +309,7 @@ class YouTubeSummarizeRequest(BaseModel):
     video_url:   str = ""
 
 @app.post("/youtube/summarize-to-gdocs")
-async def youtube_summarize_to_gdocs(data: YouTubeSummarizeRequest):
+def youtube_summarize_to_gdocs(data: YouTubeSummarizeRequest):
     """Summarize a YouTube video transcript and save it as a Google Doc."""
     # Fetch broad top-k chunks to cover the whole video
     top_chunks = query_youtube(data.video_id, "summarize the full video", top_k=30)
@@ -189,21 +348,20 @@ Provide a well-structured summary in this format:
 ### Conclusion
 (1-2 sentence concluding remark)"""
 
-    print(f"[YT-SUMMARIZE] Summarizing YouTube video: {data.video_title}")
-    summary_text = get_answer("", summarize_prompt)
-
+    logger.info("Summarizing YouTube video: %s", data.video_title)
     doc_title = f"Video Summary: {data.video_title[:70]}"
-    print(f"[YT-SUMMARIZE] Creating Google Doc: {doc_title}")
-    doc_url = create_google_doc(doc_title, summary_text, source_url=data.video_url)
-    print(f"[YT-SUMMARIZE] Doc created: {doc_url}")
+    summary_text, export_id = _summary_flights.do(
+        compute_hash(summarize_prompt), _summarize_and_export,
+        summarize_prompt, doc_title, data.video_url,
+    )
 
-    return {"summary": summary_text, "doc_url": doc_url}
+    return {"summary": summary_text, "doc_url": "", "export_id": export_id}
 
 
 # ── Summarize & Save to Google Docs ─────────────────────────────────────────
 
 @app.post("/summarize-to-gdocs", response_model=SummarizeResponse)
-async def summarize_to_gdocs(data: SummarizeRequest):
+def summarize_to_gdocs(data: SummarizeRequest):
     """Summarize the full page content with LLM and save it as a Google Doc."""
     if not data.context.strip():
         return SummarizeResponse(
@@ -234,16 +392,20 @@ Provide a well-structured summary in this format:
 ### Conclusion
 (1-2 sentence concluding remark)"""
 
-    print(f"[SUMMARIZE] Summarizing page: {data.page_title}")
-    summary_text = get_answer("", summarize_prompt)
-
-    # Create richly formatted Google Doc
+    logger.info("Summarizing page: %s", data.page_title)
     doc_title = f"Summary: {data.page_title[:80]}"
-    print(f"[SUMMARIZE] Creating Google Doc: {doc_title}")
-    doc_url = create_google_doc(doc_title, summary_text, source_url=data.page_url)
-    print(f"[SUMMARIZE] Doc created: {doc_url}")
+    summary_text, export_id = _summary_flights.do(
+        compute_hash(summarize_prompt), _summarize_and_export,
+        summarize_prompt, doc_title, data.page_url,
+    )
+
+    return SummarizeResponse(summary=summary_text, export_id=export_id)
+
 
-    return SummarizeResponse(summary=summary_text, doc_url=doc_url)
+@app.get("/gdocs-export/{export_id}")
+async def gdocs_export_status(export_id: str):
+    """Poll a queued Google Docs export: {status: pending|done|failed, doc_url, error}."""
+    return get_export(export_id)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+MAX_BATCH_QUESTIONS = 50
 
 
 class URLRequest(BaseModel):
@@ -9,11 +11,32 @@ class ChatResponse(BaseModel):
     answer: str
     sources: list[str] = []
     best_source_idx: int = 0 
+    source_spans: list[list[int]] = []  # [start, end) of each source in the request context
     
 
 class ChatRequest(BaseModel):
     message: str
     context: str | None = None  # page content from extension
+    page_url: str = ""           # enables per-domain boilerplate filtering
+    tab_id: str = ""             # enables incremental re-ingestion of this tab's page
+
+
+class ChatBatchRequest(BaseModel):
+    questions: list[str] = Field(min_length=1, max_length=MAX_BATCH_QUESTIONS)
+    context: str | None = None   # page content, or
+    video_id: str | None = None  # a video already loaded with /youtube/load
+    page_url: str = ""
+    tab_id: str = ""
+
+    @model_validator(mode="after")
+    def _needs_source(self):
+        if not self.video_id and self.context is None:
+            raise ValueError("either context or video_id is required")
+        return self
+
+
+class ChatBatchResponse(BaseModel):
+    results: list[ChatResponse]  # one per question, same order
 
 
 class SummarizeRequest(BaseModel):
@@ -24,4 +47,5 @@ class SummarizeRequest(BaseModel):
 
 class SummarizeResponse(BaseModel):
     summary: str
-    doc_url: str
\ No newline at end of file
+    doc_url: str = ""
+    export_id: str = ""  # poll /gdocs-export/{export_id} for the doc URL
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Logging setup, per-stage timers and Prometheus-format metrics.
+
+Importing this module configures leveled logging (LOG_LEVEL, default INFO).
+
+    with stage("encode"):
+        ...
+
+times a pipeline stage: the duration feeds the `stage_duration_seconds`
+histogram and, when inside an HTTP request, that request's Server-Timing
+header. Counters and histograms are rendered by `render_metrics()` for
+GET /metrics. Everything is in-process and stdlib only.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)-7s %(name)s: %(message)s",
+)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+# ── Metric types ──────────────────────────────────────────────────────────────
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def _fmt_labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{l}="{v}"' for l, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}   # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    le = self._fmt_labels(key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = self._fmt_labels(key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {series[-1]}")
+                lines.append(f"{self.name}_sum{self._fmt_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{self._fmt_labels(key)} {series[-1]}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render_metrics() -> str:
+    out = []
+    for metric in REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.render())
+    return "\n".join(out) + "\n"
+
+
+# ── Application metrics ───────────────────────────────────────────────────────
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "End-to-end HTTP request latency.",
+    ("method", "path", "status"),
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds", "Latency of individual pipeline stages.", ("stage",),
+)
+CACHE_HITS = Counter(
+    "embedding_cache_hits_total", "Chunks whose embedding came from the SQLite cache.", ("cache",),
+)
+CACHE_MISSES = Counter(
+    "embedding_cache_misses_total", "Chunks that had to be embedded.", ("cache",),
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_executions_total", "Keyed work actually executed (first caller for a key).", ("flight",),
+)
+SINGLEFLIGHT_COALESCED = Counter(
+    "singleflight_coalesced_total", "Callers that joined identical in-flight work instead of redoing it.",
+    ("flight",),
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds", "Time LLM calls waited for admission.", ("priority",),
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth", "LLM calls waiting for admission.", ("priority",),
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight", "LLM calls currently running.",
+)
+LLM_REJECTED = Counter(
+    "llm_rejected_total", "LLM calls rejected with 429 (queue full or wait timed out).",
+    ("priority", "reason"),
+)
+LLM_ATTEMPTS = Counter(
+    "llm_attempts_total", "Upstream LLM requests by outcome (ok, retryable, failed).", ("outcome",),
+)
+LLM_HEDGES = Counter(
+    "llm_hedges_total", "Hedged LLM requests fired, and how many returned first.", ("result",),
+)
+BOILERPLATE_EXCLUDED = Counter(
+    "boilerplate_chunks_excluded_total",
+    "Page chunks skipped as domain boilerplate (nav, banners, footers) before embedding.",
+)
+TAB_CHUNKS = Counter(
+    "tab_page_chunks_total",
+    "Chunks of re-sent tab pages: reused from the previous version, or re-chunked and embedded.",
+    ("result",),
+)
+CONTEXT_TOKENS = Histogram(
+    "llm_context_tokens", "Estimated tokens of page context sent to the LLM.", ("endpoint",),
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+CONTEXT_TOKENS_SAVED = Counter(
+    "llm_context_tokens_saved_total",
+    "Estimated context tokens removed by packing (overlap, weak sentences, budget).", ("endpoint",),
+)
+
+
+# ── Stage timing / Server-Timing ──────────────────────────────────────────────
+
+_request_timings: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as pipeline stage `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def begin_request() -> contextvars.Token:
+    """Start collecting stage timings for the current request."""
+    return _request_timings.set([])
+
+
+def end_request(token: contextvars.Token, total: float) -> str:
+    """Stop collecting and return the Server-Timing header value."""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    totals: dict[str, float] = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0) + elapsed
+    parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in totals.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,273 @@
+"""
+Per-tab page versions for incremental re-ingestion.
+
+Live dashboards, chat threads and infinite-scroll pages send a slightly
+different context with every question. With a tab_id, rag_service keeps the
+previous version of the page, its chunks and their int8 embedding rows
+(see quantization.py) in memory. On the next request:
+
+  1. the new text is diffed against the old: common prefix and suffix first,
+     then a line-level diff of what's left in between
+  2. the chunker's walk (text_pipeline.next_span) is replayed over the new
+     text. Each step depends only on the text just ahead of it, so wherever
+     the walk lands on the start of an old chunk whose text (and lookahead)
+     is unchanged, that chunk and its embedding are reused and the walk jumps
+     to where that step went before. Only the steps around edits run the
+     chunker, hasher and embedder. The result is exactly what chunk_page()
+     gives for the new text (for pages the rebuild sharded across the
+     preprocessing pool, chunks at unchanged shard cuts stay as they were)
+  3. rows of dropped chunks are freed and new rows are written into free
+     slots of the tab's matrix; kept rows are never copied or re-read
+
+If more than TAB_REBUILD_RATIO of the page changed, the tab is re-ingested
+from scratch through text_pipeline.preprocess_page, so the first version of
+a very large page is chunked in the process pool like any other. At most
+TAB_CACHE_SIZE tabs are kept (least recently used goes first), and tabs idle
+for TAB_TTL seconds are dropped.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from text_pipeline import CHUNK_SIZE, compute_hash, make_chunk, next_span, preprocess_page
+
+TAB_CACHE_SIZE    = int(os.getenv("TAB_CACHE_SIZE", "32"))
+TAB_TTL           = float(os.getenv("TAB_TTL", "1800"))
+TAB_REBUILD_RATIO = float(os.getenv("TAB_REBUILD_RATIO", "0.5"))
+DIFF_MAX_LINES    = 20_000   # line diff of the changed middle is skipped above this
+_BLOCK = 4096
+
+
+# ── Diff ────────────────────────────────────────────────────────────────────
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i + _BLOCK <= n and a[i:i + _BLOCK] == b[i:i + _BLOCK]:
+        i += _BLOCK
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    n = min(len(a), len(b), limit)
+    i = 0
+    while i + _BLOCK <= n and a[len(a) - i - _BLOCK:len(a) - i] == b[len(b) - i - _BLOCK:len(b) - i]:
+        i += _BLOCK
+    while i < n and a[len(a) - i - 1] == b[len(b) - i - 1]:
+        i += 1
+    return i
+
+
+def unchanged_regions(old: str, new: str) -> list[tuple[int, int, int]]:
+    """(old_start, new_start, length) of text the two versions share, in order."""
+    prefix = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    regions = [(0, 0, prefix)] if prefix else []
+
+    old_mid, new_mid = old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+    if old_mid and new_mid:
+        old_lines = old_mid.splitlines(keepends=True)
+        new_lines = new_mid.splitlines(keepends=True)
+        if len(old_lines) + len(new_lines) <= DIFF_MAX_LINES:
+            old_at = np.concatenate(([0], np.cumsum([len(l) for l in old_lines])))
+            new_at = np.concatenate(([0], np.cumsum([len(l) for l in new_lines])))
+            for i, j, size in _matching_lines(old_lines, new_lines):
+                regions.append((prefix + int(old_at[i]), prefix + int(new_at[j]),
+                                int(old_at[i + size] - old_at[i])))
+    if suffix:
+        regions.append((len(old) - suffix, len(new) - suffix, suffix))
+    return regions
+
+
+def _matching_lines(a: list[str], b: list[str]) -> list[tuple[int, int, int]]:
+    """
+    (i, j, size) runs of equal lines, in order. Patience-style: lines that
+    occur once in each version anchor the match, the longest in-order chain
+    of anchors is kept, and each anchor grows into the equal lines around it.
+    Linear apart from the chain, where difflib is quadratic-ish on long pages.
+    """
+    count_a, count_b = Counter(a), Counter(b)
+    index_a = {line: i for i, line in enumerate(a) if count_a[line] == 1}
+    anchors = [(index_a[line], j) for j, line in enumerate(b)
+               if count_b[line] == 1 and line in index_a]
+
+    # Longest chain of anchors increasing in both versions
+    tails, tail_at, prev = [], [], [-1] * len(anchors)
+    for k, (i, _) in enumerate(anchors):
+        pos = bisect.bisect_left(tails, i)
+        if pos:
+            prev[k] = tail_at[pos - 1]
+        if pos == len(tails):
+            tails.append(i)
+            tail_at.append(k)
+        else:
+            tails[pos], tail_at[pos] = i, k
+    chain, k = [], tail_at[-1] if tail_at else -1
+    while k != -1:
+        chain.append(anchors[k])
+        k = prev[k]
+    chain.reverse()
+
+    runs, done_a, done_b = [], 0, 0
+    for i, j in chain:
+        if i < done_a or j < done_b:    # already inside the previous run
+            continue
+        while i > done_a and j > done_b and a[i - 1] == b[j - 1]:
+            i, j = i - 1, j - 1
+        size = 0
+        while i + size < len(a) and j + size < len(b) and a[i + size] == b[j + size]:
+            size += 1
+        runs.append((i, j, size))
+        done_a, done_b = i + size, j + size
+    return runs
+
+
+# ── Tab state ───────────────────────────────────────────────────────────────
+
+class TabPage:
+    """One tab's latest page text, its chunks, and their rows in an int8 matrix."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.page = ""
+        self.chunks: list[dict] = []    # page order; each has a "row" into codes/scales and
+                                        # its walk step ("at" → "next") in self.page
+        self.codes = np.zeros((0, 0), dtype=np.int8)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.free: list[int] = []
+        self.used_at = time.monotonic()
+
+    def matrix(self) -> tuple[np.ndarray, np.ndarray]:
+        """(codes, scales) of the current chunks, in chunk order."""
+        rows = [c["row"] for c in self.chunks]
+        return self.codes[rows], self.scales[rows]
+
+    def update(self, page: str, embed) -> dict:
+        """
+        Bring the tab to `page`. `embed(chunks)` returns the chunks with
+        qvec/qscale attached (rag_service.embed_chunks). Returns stats.
+        """
+        if self.chunks and page == self.page:
+            return {"kept": len(self.chunks), "rechunked": 0, "changed_chars": 0}
+
+        reusable, changed = {}, len(page)
+        if self.chunks:
+            regions = unchanged_regions(self.page, page)
+            changed = len(page) - sum(length for _, _, length in regions)
+            if changed <= TAB_REBUILD_RATIO * len(page):
+                reusable = self._reusable(regions, len(page))
+        if not reusable:
+            self.codes = np.zeros((0, 0), dtype=np.int8)
+            self.scales = np.zeros(0, dtype=np.float32)
+            self.free, self.chunks = [], []
+
+        chunks = self._walk(page, reusable) if reusable else preprocess_page(page)
+        kept_rows = {c["row"] for c in chunks if "row" in c}
+        self.free += [c["row"] for c in self.chunks if c["row"] not in kept_rows]
+        fresh = [i for i, c in enumerate(chunks) if "row" not in c]
+        for i, chunk in zip(fresh, self._write_rows(embed([chunks[i] for i in fresh]))):
+            chunks[i] = chunk
+        self.chunks, self.page = chunks, page
+        return {"kept": len(kept_rows), "rechunked": len(fresh), "changed_chars": changed}
+
+    # ── internals ───────────────────────────────────────────────────────────
+
+    def _reusable(self, regions: list[tuple[int, int, int]], new_len: int) -> dict[int, dict]:
+        """
+        Old chunks whose walk step reads only unchanged text, keyed by their
+        walk position in the new text and shifted to new-text offsets.
+        """
+        reusable, r = {}, 0
+        for chunk in self.chunks:   # both lists are ordered by old offset
+            at = chunk["at"]
+            while r < len(regions) and regions[r][0] + regions[r][2] <= at:
+                r += 1
+            if r == len(regions):
+                break
+            old_start, new_start, length = regions[r]
+            if old_start > at:
+                continue
+            to_end = old_start + length == len(self.page) and new_start + length == new_len
+            if to_end or max(at + CHUNK_SIZE, chunk["next"]) < old_start + length:
+                shift = new_start - old_start
+                reusable[at + shift] = {**chunk, "start": chunk["start"] + shift,
+                                        "end": chunk["end"] + shift, "at": at + shift,
+                                        "next": chunk["next"] + shift}
+        return reusable
+
+    def _walk(self, page: str, reusable: dict[int, dict]) -> list[dict]:
+        """chunk_page(page) with hashes, taking reusable chunks where the walk reaches them."""
+        chunks = []
+        pos, n = len(page) - len(page.lstrip()), len(page)
+        while pos < n:
+            old = reusable.get(pos)
+            if old:
+                chunks.append(old)
+                pos = old["next"]
+                while pos < n and page[pos].isspace():   # a shard's last step stops at the cut
+                    pos += 1
+                continue
+            stop, nxt = next_span(page, pos)
+            chunk = make_chunk(page, pos, stop) if stop > pos else None
+            if chunk:
+                chunks.append({**chunk, "hash": compute_hash(chunk["content"]), "at": pos, "next": nxt})
+            pos = nxt
+        return chunks
+
+    def _write_rows(self, chunks: list[dict]) -> list[dict]:
+        """
+        Store each chunk's qvec/qscale in a row (free rows first, growing the
+        matrix by doubling). Returns the chunks with "row" in place of the vector.
+        """
+        if not chunks:
+            return []
+        dim = len(chunks[0]["qvec"])
+        if self.codes.shape[1] != dim:
+            self.codes = np.zeros((0, dim), dtype=np.int8)
+        short = len(chunks) - len(self.free)
+        if short > 0:
+            size = len(self.codes)
+            grown = max(size * 2, size + short)
+            codes = np.zeros((grown, dim), dtype=np.int8)
+            scales = np.zeros(grown, dtype=np.float32)
+            codes[:size], scales[:size] = self.codes, self.scales
+            self.codes, self.scales = codes, scales
+            self.free += range(grown - 1, size - 1, -1)
+        placed = []
+        for chunk in chunks:
+            row = self.free.pop()
+            self.codes[row] = chunk["qvec"]
+            self.scales[row] = chunk["qscale"]
+            placed.append({k: v for k, v in chunk.items() if k not in ("qvec", "qscale")} | {"row": row})
+        return placed
+
+
+class TabPages:
+    """LRU of TabPage by tab id."""
+
+    def __init__(self, size: int = TAB_CACHE_SIZE, ttl: float = TAB_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._tabs: OrderedDict[str, TabPage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tab_id: str) -> TabPage:
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, t in self._tabs.items() if now - t.used_at > self.ttl]:
+                del self._tabs[key]
+            tab = self._tabs.pop(tab_id, None) or TabPage()
+            tab.used_at = now
+            self._tabs[tab_id] = tab
+            while len(self._tabs) > self.size:
+                self._tabs.popitem(last=False)
+        return tab
+
+
+tabs = TabPages()
@@ -0,0 +1,258 @@
+"""
+Background price refresher.
+
+Re-fetches every tracked product page on an interval so price history keeps
+growing between user visits. One pooled async httpx client is shared by the
+whole cycle; concurrency is capped globally and per domain, and pages are
+fetched conditionally (ETag / Last-Modified), so an unchanged page costs a
+304 and is recorded at its last known price.
+
+The HTML → price step is pluggable: pass any `extractor(html, url)` returning
+(title, price_str) or None. The default mirrors the selectors price_tracker.js
+uses and validates candidates with parse_price; record_prices then applies
+parse_price / detect_currency exactly as for extension-reported prices.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import re
+from collections import defaultdict
+from typing import Callable
+from urllib.parse import urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+import price_service
+from price_service import get_tracked_products, record_prices, parse_price
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL   = int(os.getenv("PRICE_REFRESH_INTERVAL", "0"))   # seconds; 0 = disabled
+MAX_CONCURRENCY    = int(os.getenv("PRICE_REFRESH_CONCURRENCY", "64"))
+PER_DOMAIN_LIMIT   = int(os.getenv("PRICE_REFRESH_PER_DOMAIN", "4"))
+WRITE_BATCH_SIZE   = 200
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+Extractor = Callable[[str, str], "tuple[str, str] | None"]
+
+# Same order as extractPrice() / extractTitle() in price_tracker.js
+PRICE_SELECTORS = [
+    ".a-price-whole",
+    "#priceblock_ourprice",
+    "#priceblock_dealprice",
+    ".a-offscreen",
+    "._30jeq3",
+    "._16Jk6d",
+    "[class*='price']:not([class*='was']):not([class*='old'])",
+    "[id*='price']",
+    "[class*='Price']",
+    ".price",
+    "#price",
+]
+TITLE_SELECTORS = [
+    "#productTitle",
+    ".B_NuCI",
+    "h1.product-title",
+    "h1[class*='title']",
+    "h1[class*='product']",
+    "h1[class*='name']",
+    ".pdp-title",
+    "#title",
+    "h1",
+]
+_owner_lock = None   # open lock file while this process owns the refresher
+
+_CURRENCY_RE = re.compile(r"[₹$€£]|rs\.?", re.I)
+_PRICE_IN_TEXT_RE = re.compile(r"[₹$€£]\s*[\d,]+(\.\d{1,2})?")
+
+
+def extract_price_from_html(html: str, url: str) -> tuple[str, str] | None:
+    """Default extractor: (title, price_str) from a product page, or None."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    title = ""
+    for sel in TITLE_SELECTORS:
+        el = soup.select_one(sel)
+        if el and el.get_text(strip=True):
+            title = el.get_text(strip=True)[:200]
+            break
+    if not title and soup.title:
+        title = soup.title.get_text(strip=True)[:200]
+
+    for sel in PRICE_SELECTORS:
+        for el in soup.select(sel):
+            text = re.sub(r"\s+", "", el.get_text())
+            if _CURRENCY_RE.search(text) and parse_price(text):
+                return title, text[:30]
+
+    match = _PRICE_IN_TEXT_RE.search(soup.get_text(" "))
+    if match and parse_price(match.group(0)):
+        return title, re.sub(r"\s+", "", match.group(0))
+    return None
+
+
+def claim_refresher() -> bool:
+    """
+    Make this process the one that runs the refresher. With several API
+    workers every one starts the app; only the first to take an exclusive
+    lock on a file beside prices.db refreshes, the lock being released when
+    it exits. Returns whether this process holds it.
+    """
+    global _owner_lock
+    if _owner_lock is not None:
+        return True
+    f = open(f"{price_service.DB_PATH}.refresh.lock", "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _owner_lock = f
+    return True
+
+
+class PriceRefresher:
+    """Fetches all tracked product pages concurrently and records their prices."""
+
+    def __init__(self,
+                 extractor: Extractor = extract_price_from_html,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 per_domain_limit: int = PER_DOMAIN_LIMIT,
+                 timeout: float = 15.0,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        self.extractor = extractor
+        self.per_domain_limit = per_domain_limit
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._domains: dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.per_domain_limit)
+        )
+        self._validators: dict[str, dict[str, str]] = {}   # url -> conditional request headers
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "en-IN,en;q=0.9"},
+            limits=httpx.Limits(max_connections=max_concurrency,
+                                max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport,
+        )
+        self._task: asyncio.Task | None = None
+
+    async def aclose(self):
+        await self.stop()
+        await self._client.aclose()
+
+    # ── One cycle ──────────────────────────────────────────────────────────
+
+    async def refresh_all(self) -> dict:
+        """Re-check every tracked URL once. Returns per-cycle counters."""
+        products = await asyncio.to_thread(get_tracked_products)
+        stats = {"checked": len(products), "changed_pages": 0, "not_modified": 0,
+                 "no_price": 0, "extract_errors": 0, "errors": 0, "recorded": 0}
+
+        pending: list[dict] = []
+        for coro in asyncio.as_completed([self._check(p, stats) for p in products]):
+            item = await coro
+            if item:
+                pending.append(item)
+            if len(pending) >= WRITE_BATCH_SIZE:
+                stats["recorded"] += await self._flush(pending)
+                pending = []
+        if pending:
+            stats["recorded"] += await self._flush(pending)
+
+        logger.info("Refresh cycle: %s", stats)
+        return stats
+
+    async def _flush(self, items: list[dict]) -> int:
+        # SQLite writes happen off the event loop, one transaction per batch
+        result = await asyncio.to_thread(record_prices, items)
+        return result["recorded"]
+
+    async def _check(self, product: dict, stats: dict) -> dict | None:
+        url = product["url"]
+        # Domain slot first: tasks queued behind a busy domain must not hold global slots
+        async with self._domains[urlparse(url).netloc], self._global:
+            try:
+                resp = await self._client.get(url, headers=self._validators.get(url, {}))
+            except httpx.HTTPError as e:
+                stats["errors"] += 1
+                logger.warning("%s fetch error: %s", url, e)
+                return None
+
+        if resp.status_code == 304:
+            stats["not_modified"] += 1
+            return {
+                "url":       url,
+                "title":     product["title"],
+                "price":     f"{product['currency']}{product['price']}",
+                "image_url": product["image_url"],
+            }
+        if resp.status_code != 200:
+            stats["errors"] += 1
+            return None
+
+        self._remember_validators(url, resp)
+        stats["changed_pages"] += 1
+
+        # HTML parsing is CPU work; keep it off the event loop serving the API.
+        # One page the extractor chokes on must not abort the whole cycle.
+        try:
+            extracted = await asyncio.to_thread(self.extractor, resp.text, url)
+        except Exception as e:
+            stats["extract_errors"] += 1
+            logger.warning("%s extract error: %s", url, e)
+            return None
+        if not extracted:
+            stats["no_price"] += 1
+            return None
+        title, price_str = extracted
+        if not _CURRENCY_RE.search(price_str):
+            # Bare number from a custom extractor: keep the product's known currency
+            price_str = f"{product['currency']}{price_str}"
+        return {
+            "url":       url,
+            "title":     title or product["title"],
+            "price":     price_str,
+            "image_url": product["image_url"],
+        }
+
+    def _remember_validators(self, url: str, resp: httpx.Response):
+        headers = {}
+        if etag := resp.headers.get("etag"):
+            headers["If-None-Match"] = etag
+        if modified := resp.headers.get("last-modified"):
+            headers["If-Modified-Since"] = modified
+        if headers:
+            self._validators[url] = headers
+        else:
+            self._validators.pop(url, None)
+
+    # ── Scheduling ─────────────────────────────────────────────────────────
+
+    def start(self, interval: int = REFRESH_INTERVAL):
+        """Run refresh_all every `interval` seconds as a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self, interval: int):
+        while True:
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logger.exception("Refresh cycle failed: %s", e)
+            await asyncio.sleep(interval)
@@ -1,11 +1,23 @@
+import os
 import sqlite3
 import json
+import math
 import re
 from datetime import datetime
 from urllib.parse import urlparse
 
 DB_PATH = "prices.db"
 
+# "rows": one price_history row per recorded observation (at most hourly).
+# "runs": one price_runs row per stretch of unchanged price, with first/last
+#         seen timestamps; existing rows are compacted into runs on first use.
+PRICE_STORAGE = os.getenv("PRICE_STORAGE", "rows")
+
+MAX_CHART_POINTS = 90   # upper bound on history points returned to the sparkline
+
+_summary_ready: set[str] = set()   # DB paths already migrated this process
+
+
 def get_db():
     conn = sqlite3.connect(DB_PATH)
     conn.execute("""
@@ -20,14 +32,181 @@ def get_db():
             recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
-    # Index for fast URL lookups
+    # (url, recorded_at) serves both URL lookups and the "recorded in the last
+    # hour" dedupe check as a single index range scan; it supersedes idx_url.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_url_recorded ON price_history(url, recorded_at)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_url")
+    # Per-URL running stats, updated on every insert so reads never scan history
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_summary (
+            url         TEXT PRIMARY KEY,
+            count       INTEGER NOT NULL,
+            total       REAL NOT NULL,
+            min_price   REAL NOT NULL,
+            max_price   REAL NOT NULL,
+            last_price  REAL NOT NULL,
+            prev_price  REAL,
+            currency    TEXT,
+            title       TEXT,
+            image_url   TEXT,
+            first_at    DATETIME,
+            last_at     DATETIME
+        )
+    """)
+    # Change-point storage: consecutive identical observations collapse into one run
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_runs (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            url          TEXT NOT NULL,
+            domain       TEXT NOT NULL,
+            title        TEXT,
+            price        REAL NOT NULL,
+            currency     TEXT DEFAULT '₹',
+            image_url    TEXT,
+            first_seen   DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_seen    DATETIME DEFAULT CURRENT_TIMESTAMP,
+            observations INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_runs_url_seen ON price_runs(url, last_seen)
+    """)
+    # Last observation of each run on each day it was seen: enough to bucket
+    # runs exactly like rows, since chart buckets are whole days.
+    new_days = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'price_run_days'").fetchone()
     conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_url ON price_history(url)
+        CREATE TABLE IF NOT EXISTS price_run_days (
+            run_id  INTEGER NOT NULL,
+            day     TEXT NOT NULL,
+            last_at DATETIME NOT NULL,
+            PRIMARY KEY (run_id, day)
+        ) WITHOUT ROWID
     """)
+    if new_days:
+        # Runs stored before this table only know their first and last observation
+        conn.execute("""
+            INSERT INTO price_run_days (run_id, day, last_at)
+            SELECT id, date(first_seen), first_seen FROM price_runs
+        """)
+        conn.execute("""
+            INSERT INTO price_run_days (run_id, day, last_at)
+            SELECT id, date(last_seen), last_seen FROM price_runs WHERE true
+            ON CONFLICT(run_id, day) DO UPDATE SET last_at = excluded.last_at
+        """)
     conn.commit()
+    _backfill_summaries(conn)
+    if PRICE_STORAGE == "runs":
+        compact_price_history(conn)
     return conn
 
 
+def _backfill_summaries(conn: sqlite3.Connection):
+    """One-time migration: build summaries for history recorded before the table existed."""
+    if DB_PATH in _summary_ready:
+        return
+    conn.execute("""
+        INSERT INTO price_summary
+          (url, count, total, min_price, max_price, last_price, prev_price,
+           currency, title, image_url, first_at, last_at)
+        SELECT url, COUNT(*), SUM(price), MIN(price), MAX(price),
+               MAX(CASE WHEN rn = 1 THEN price END),
+               MAX(CASE WHEN rn = 2 THEN price END),
+               MAX(CASE WHEN rn = 1 THEN currency END),
+               MAX(CASE WHEN rn = 1 THEN title END),
+               MAX(CASE WHEN rn = 1 THEN image_url END),
+               MIN(recorded_at), MAX(recorded_at)
+        FROM (
+            SELECT url, price, currency, title, image_url, recorded_at,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY url ORDER BY recorded_at DESC, id DESC
+                   ) AS rn
+            FROM price_history
+            WHERE url NOT IN (SELECT url FROM price_summary)
+        )
+        GROUP BY url
+    """)
+    conn.commit()
+    _summary_ready.add(DB_PATH)
+
+
+def compact_price_history(conn: sqlite3.Connection) -> int:
+    """
+    Migration to run-length storage: fold every price_history row into
+    price_runs (consecutive equal prices per URL become one run) and delete
+    the rows. Returns the number of rows compacted.
+    """
+    (pending,) = conn.execute("SELECT COUNT(*) FROM price_history").fetchone()
+    if not pending:
+        return 0
+
+    with conn:
+        (base,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM price_runs").fetchone()
+        conn.execute("""
+            INSERT INTO price_runs
+              (url, domain, title, price, currency, image_url,
+               first_seen, last_seen, observations)
+            SELECT url, MAX(domain), MAX(title), price, currency, MAX(image_url),
+                   MIN(recorded_at), MAX(recorded_at), COUNT(*)
+            FROM (
+                SELECT *, SUM(changed) OVER (
+                    PARTITION BY url ORDER BY recorded_at, id
+                ) AS run
+                FROM (
+                    SELECT *, CASE
+                        WHEN price    IS LAG(price)    OVER w
+                         AND currency IS LAG(currency) OVER w THEN 0
+                        ELSE 1
+                    END AS changed
+                    FROM price_history
+                    WINDOW w AS (PARTITION BY url ORDER BY recorded_at, id)
+                )
+            )
+            GROUP BY url, run
+            ORDER BY MIN(recorded_at)
+        """)
+        conn.execute("""
+            INSERT INTO price_run_days (run_id, day, last_at)
+            SELECT r.id, date(h.recorded_at), MAX(h.recorded_at)
+            FROM price_runs r
+            JOIN price_history h
+              ON h.url = r.url AND h.price = r.price AND h.currency IS r.currency
+             AND h.recorded_at BETWEEN r.first_seen AND r.last_seen
+            WHERE r.id > ?
+            GROUP BY r.id, date(h.recorded_at)
+        """, (base,))
+        conn.execute("DELETE FROM price_history")
+    return pending
+
+
+# Record a run's latest observation (its last_seen) against that day
+_SEEN_DAY_SQL = """
+    INSERT INTO price_run_days (run_id, day, last_at)
+    SELECT id, date(last_seen), last_seen FROM price_runs WHERE id = ?
+    ON CONFLICT(run_id, day) DO UPDATE SET last_at = excluded.last_at
+"""
+
+_UPSERT_SUMMARY_SQL = """
+    INSERT INTO price_summary
+      (url, count, total, min_price, max_price, last_price, prev_price,
+       currency, title, image_url, first_at, last_at)
+    VALUES (?, 1, ?, ?, ?, ?, NULL, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(url) DO UPDATE SET
+        count      = count + 1,
+        total      = total + excluded.total,
+        min_price  = MIN(min_price, excluded.min_price),
+        max_price  = MAX(max_price, excluded.max_price),
+        prev_price = last_price,
+        last_price = excluded.last_price,
+        currency   = excluded.currency,
+        title      = excluded.title,
+        image_url  = excluded.image_url,
+        last_at    = excluded.last_at
+"""
+
+
 def normalize_url(url: str) -> str:
     """Remove tracking params, keep only product-identifying parts."""
     parsed = urlparse(url)
@@ -40,6 +219,8 @@ def parse_price(price_str: str) -> float | None:
     """Extract numeric price from string like '₹1,23,456' or '$12.99'"""
     if not price_str:
         return None
+    # Drop a "Rs." prefix first: its dot would otherwise become a decimal point
+    price_str = re.sub(r"rs\.", "", price_str, flags=re.I)
     # Remove currency symbols, spaces, commas
     cleaned = re.sub(r"[^\d.]", "", price_str.replace(",", ""))
     try:
@@ -67,57 +248,209 @@ def record_price(url: str, title: str, price_str: str, image_url: str = "") -> d
     domain = urlparse(url).netloc
 
     conn = get_db()
+    _store_observations(conn, [(clean_url, domain, title, price, currency, image_url)])
+    result = _build_history(conn, clean_url)
+    conn.close()
+    return result
 
-    # Avoid duplicate recording within same hour
-    existing = conn.execute("""
-        SELECT id FROM price_history
-        WHERE url = ? AND recorded_at > datetime('now', '-1 hour')
-    """, (clean_url,)).fetchone()
-
-    if not existing:
-        conn.execute("""
-            INSERT INTO price_history (url, domain, title, price, currency, image_url)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (clean_url, domain, title, price, currency, image_url))
-        conn.commit()
 
-    result = get_price_history(clean_url)
+def get_price_history(url: str, max_points: int = MAX_CHART_POINTS) -> dict:
+    """Get price stats and (downsampled) history for a URL."""
+    clean_url = normalize_url(url)
+    conn = get_db()
+    result = _build_history(conn, clean_url, max_points)
     conn.close()
     return result
 
 
-def get_price_history(url: str) -> dict:
-    """Get full price history and stats for a URL."""
-    clean_url = normalize_url(url)
+def record_prices(items: list[dict]) -> dict:
+    """
+    Store many price observations in one transaction.
+    Each item has url, title, price (raw string) and optional image_url.
+    Applies the same one-per-hour dedupe as record_price, then returns stats
+    for every URL in the batch.
+    """
+    parsed = {}   # clean_url -> row; first observation per URL wins
+    skipped = 0
+    for item in items:
+        price_str = item.get("price") or ""
+        price = parse_price(price_str)
+        if not price:
+            skipped += 1
+            continue
+        clean_url = normalize_url(item["url"])
+        if clean_url in parsed:
+            skipped += 1
+            continue
+        parsed[clean_url] = (
+            clean_url, urlparse(item["url"]).netloc, item.get("title", ""),
+            price, detect_currency(price_str), item.get("image_url", ""),
+        )
+
     conn = get_db()
+    urls = list(parsed)
+    rows = _store_observations(conn, list(parsed.values()))
+
+    stats = _summaries_for(conn, urls)
+    conn.close()
+    return {
+        "success":  True,
+        "recorded": len(rows),
+        "skipped":  skipped + len(parsed) - len(rows),
+        "products": stats,
+    }
+
+
+def get_price_histories(urls: list[str]) -> dict:
+    """Stats (no chart points) for many URLs, keyed by the URL as given."""
+    clean = {url: normalize_url(url) for url in urls}
+    conn = get_db()
+    stats = _summaries_for(conn, list(set(clean.values())))
+    conn.close()
+    missing = {"success": False, "error": "No price history found for this product."}
+    return {url: stats.get(c, missing) for url, c in clean.items()}
 
-    rows = conn.execute("""
-        SELECT price, currency, title, image_url, recorded_at
-        FROM price_history
-        WHERE url = ?
-        ORDER BY recorded_at ASC
-    """, (clean_url,)).fetchall()
 
+def get_tracked_products() -> list[dict]:
+    """Every tracked URL with its latest known price, for the background refresher."""
+    conn = get_db()
+    rows = conn.execute("""
+        SELECT url, title, last_price, currency, image_url FROM price_summary
+    """).fetchall()
     conn.close()
+    return [
+        {"url": u, "title": t, "price": p, "currency": c, "image_url": i}
+        for u, t, p, c, i in rows
+    ]
+
+
+def _summaries_for(conn: sqlite3.Connection, clean_urls: list[str]) -> dict:
+    stats = {}
+    for batch in _batched(clean_urls):
+        for row in conn.execute(f"""
+            SELECT url, count, total, min_price, max_price, last_price, prev_price,
+                   currency, title, image_url
+            FROM price_summary
+            WHERE url IN ({_placeholders(batch)})
+        """, batch):
+            stats[row[0]] = _summary_stats(row[1:])
+    return stats
+
+
+def _store_observations(conn: sqlite3.Connection, rows: list[tuple]) -> list[tuple]:
+    """
+    Persist (url, domain, title, price, currency, image_url) observations in one
+    transaction, skipping URLs already recorded within the last hour (at most
+    one row per URL). Returns the rows that were actually recorded.
+    """
+    urls = [r[0] for r in rows]
+
+    if PRICE_STORAGE == "runs":
+        latest = _latest_runs(conn, urls)
+        fresh = [r for r in rows if not (r[0] in latest and latest[r[0]][3])]
+        extend, new = [], []
+        for r in fresh:
+            run = latest.get(r[0])
+            if run and run[1] == r[3] and run[2] == r[4]:
+                extend.append((r[2], r[5], run[0]))
+            else:
+                new.append(r)
+        with conn:
+            conn.executemany("""
+                UPDATE price_runs
+                SET last_seen = CURRENT_TIMESTAMP, observations = observations + 1,
+                    title = ?, image_url = ?
+                WHERE id = ?
+            """, extend)
+            seen = [(run_id,) for _, _, run_id in extend]
+            for r in new:
+                seen.append((conn.execute("""
+                    INSERT INTO price_runs (url, domain, title, price, currency, image_url)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, r).lastrowid,))
+            conn.executemany(_SEEN_DAY_SQL, seen)
+            _upsert_summaries(conn, fresh)
+        return fresh
+
+    # Avoid duplicate recording within same hour
+    recent = set()
+    for batch in _batched(urls):
+        recent.update(r[0] for r in conn.execute(f"""
+            SELECT DISTINCT url FROM price_history
+            WHERE url IN ({_placeholders(batch)})
+              AND recorded_at > datetime('now', '-1 hour')
+        """, batch))
+
+    fresh = [r for r in rows if r[0] not in recent]
+    with conn:
+        conn.executemany("""
+            INSERT INTO price_history (url, domain, title, price, currency, image_url)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, fresh)
+        _upsert_summaries(conn, fresh)
+    return fresh
+
+
+def _latest_runs(conn: sqlite3.Connection, urls: list[str]) -> dict:
+    """url -> (run id, price, currency, seen within the last hour) for each URL's newest run."""
+    latest = {}
+    for batch in _batched(urls):
+        # Bare columns alongside a single MAX() come from the row holding that max
+        for url, run_id, price, currency, last_seen, recent in conn.execute(f"""
+            SELECT url, id, price, currency, MAX(last_seen),
+                   MAX(last_seen) > datetime('now', '-1 hour')
+            FROM price_runs
+            WHERE url IN ({_placeholders(batch)})
+            GROUP BY url
+        """, batch):
+            latest[url] = (run_id, price, currency, bool(recent))
+    return latest
+
+
+def _upsert_summaries(conn: sqlite3.Connection, rows: list[tuple]):
+    conn.executemany(_UPSERT_SUMMARY_SQL, [
+        (url, price, price, price, price, currency, title, image_url)
+        for url, _, title, price, currency, image_url in rows
+    ])
+
+
+def _placeholders(values: list) -> str:
+    return ",".join("?" * len(values))
 
-    if not rows:
+
+def _batched(values: list, size: int = 500):
+    """Keep IN (...) lists under SQLite's bound-parameter limit."""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _build_history(conn: sqlite3.Connection, clean_url: str,
+                   max_points: int = MAX_CHART_POINTS) -> dict:
+    summary = conn.execute("""
+        SELECT count, total, min_price, max_price, last_price, prev_price,
+               currency, title, image_url
+        FROM price_summary
+        WHERE url = ?
+    """, (clean_url,)).fetchone()
+
+    if not summary:
         return {"success": False, "error": "No price history found for this product."}
 
-    prices     = [r[0] for r in rows]
-    currency   = rows[-1][1]
-    title      = rows[-1][2]
-    image_url  = rows[-1][3]
-    timestamps = [r[4] for r in rows]
+    result = _summary_stats(summary)
+    history, resolution = _history_points(conn, clean_url, result["data_points"], max_points)
+    result["resolution"] = resolution
+    result["history"] = history
+    return result
+
 
-    current = prices[-1]
-    lowest  = min(prices)
-    highest = max(prices)
-    avg     = round(sum(prices) / len(prices), 2)
+def _summary_stats(summary: tuple) -> dict:
+    """Turn a price_summary row (count .. image_url) into the stats part of a response."""
+    count, total, lowest, highest, current, previous, currency, title, image_url = summary
 
     # Price trend: compare last price to previous
     trend = "stable"
-    if len(prices) >= 2:
-        diff = prices[-1] - prices[-2]
+    if previous is not None:
+        diff = current - previous
         if diff > 0:   trend = "up"
         elif diff < 0: trend = "down"
 
@@ -129,11 +462,109 @@ def get_price_history(url: str) -> dict:
         "current":    current,
         "lowest":     lowest,
         "highest":    highest,
-        "average":    avg,
+        "average":    round(total / count, 2),
         "trend":      trend,
-        "data_points": len(prices),
-        "history": [
-            {"price": p, "date": t}
-            for p, t in zip(prices, timestamps)
-        ]
-    }
\ No newline at end of file
+        "data_points": count,
+    }
+
+
+def _history_points(conn: sqlite3.Connection, clean_url: str,
+                    count: int, max_points: int) -> tuple[list[dict], str]:
+    """
+    Return at most `max_points` chart points.
+    Short histories are returned raw; longer ones are bucketed by day, then by
+    week (widening to multi-week buckets if needed), each bucket carrying its
+    low / high / close price and the timestamp of its close.
+    `count` is the number of observations (from price_summary) in both storage
+    modes, so the same history gets the same resolution either way.
+    """
+    points = _points_source()
+    params = {"url": clean_url}
+
+    if count <= max_points:
+        rows = conn.execute(f"""
+            SELECT price, recorded_at FROM ({points})
+            ORDER BY recorded_at ASC
+        """, params).fetchall()
+        return [{"price": p, "date": t} for p, t in rows], "raw"
+
+    first_at, last_at = conn.execute(f"""
+        SELECT MIN(recorded_at), MAX(recorded_at) FROM ({points})
+    """, params).fetchone()
+    span_days = (datetime.fromisoformat(last_at) - datetime.fromisoformat(first_at)).days + 1
+
+    if span_days <= max_points:
+        width, resolution = 1, "daily"
+    else:
+        width = _bucket_width(first_at, last_at, max_points)
+        resolution = "weekly" if width == 7 else f"{width // 7}-weekly"
+
+    rows = conn.execute(f"""
+        SELECT MIN(price), MAX(price), close, MAX(recorded_at)
+        FROM (
+            SELECT price, recorded_at,
+                   CAST(julianday(date(recorded_at)) / :width AS INTEGER) AS bucket,
+                   LAST_VALUE(price) OVER (
+                       PARTITION BY CAST(julianday(date(recorded_at)) / :width AS INTEGER)
+                       ORDER BY recorded_at
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                   ) AS close
+            FROM ({_bucket_points_source()})
+        )
+        GROUP BY bucket
+        ORDER BY bucket ASC
+    """, {**params, "width": width}).fetchall()
+
+    history = [
+        {"price": close, "date": t, "low": lo, "high": hi}
+        for lo, hi, close, t in rows
+    ]
+    return history, resolution
+
+
+_JULIAN_OFFSET = 1721424.5   # julianday(date) - date.toordinal()
+
+
+def _bucket_width(first_at: str, last_at: str, max_points: int) -> int:
+    """
+    Smallest whole-week bucket width (in days) for which the buckets between
+    `first_at` and `last_at` number at most `max_points`. Buckets are aligned
+    to the julian day, so a span can straddle one more bucket than
+    span / width; widen until the aligned count fits.
+    """
+    first = datetime.fromisoformat(first_at).toordinal() + _JULIAN_OFFSET
+    last = datetime.fromisoformat(last_at).toordinal() + _JULIAN_OFFSET
+    width = 7 * math.ceil(math.ceil((last - first + 1) / 7) / max_points)
+    while int(last // width) - int(first // width) + 1 > max_points:
+        width += 7
+    return width
+
+
+def _points_source() -> str:
+    """
+    SQL yielding (price, recorded_at) chart points for :url.
+    In run storage each run contributes its first-seen point, plus its
+    last-seen point when the price was observed more than once.
+    """
+    if PRICE_STORAGE == "runs":
+        return """
+            SELECT price, first_seen AS recorded_at FROM price_runs WHERE url = :url
+            UNION ALL
+            SELECT price, last_seen FROM price_runs WHERE url = :url AND observations > 1
+        """
+    return "SELECT price, recorded_at FROM price_history WHERE url = :url"
+
+
+def _bucket_points_source() -> str:
+    """
+    SQL yielding (price, recorded_at) points for :url that bucket by day (or
+    wider) exactly like the raw observations: in run storage, each run's last
+    observation on every day it was seen.
+    """
+    if PRICE_STORAGE == "runs":
+        return """
+            SELECT r.price, d.last_at AS recorded_at
+            FROM price_runs r JOIN price_run_days d ON d.run_id = r.id
+            WHERE r.url = :url
+        """
+    return _points_source()
@@ -0,0 +1,89 @@
+"""
+Scalar int8 quantization of embeddings, and two-stage top-k search.
+
+Each vector is stored as int8 codes plus one float scale (max |x| / 127), so
+x ≈ codes * scale. That is 384 bytes + a REAL per all-MiniLM-L6-v2 vector,
+against ~1.5 KB as float32 and ~8 KB as the JSON text the caches used to hold.
+
+two_stage_search():
+  1. scores every candidate from the int8 codes (approximate dot product)
+  2. reranks the best `shortlist` per query against full-precision vectors,
+     fetched only for those rows
+
+numpy has no BLAS path for int8, so stage 1 casts blocks of codes to float32
+and uses sgemm. It is about as fast as an exact float32 search; the savings
+are disk space and resident memory, not FLOPs.
+"""
+import json
+import os
+
+import numpy as np
+
+SEARCH_SHORTLIST = int(os.getenv("SEARCH_SHORTLIST", "64"))   # stage-2 rows per query, at least
+_BLOCK_ROWS = 16384
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(int8 codes (n, d), float32 scales (n,)) for a (n, d) float matrix."""
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def vector_to_blob(vector) -> bytes:
+    """Full-precision storage format: raw little-endian float32."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def blob_to_vector(value) -> np.ndarray:
+    """Inverse of vector_to_blob; also reads rows written as JSON text before int8 storage."""
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    return np.frombuffer(value, dtype="<f4")
+
+
+def approximate_scores(query_embeddings: np.ndarray, codes: np.ndarray,
+                       scales: np.ndarray) -> np.ndarray:
+    """(queries, n) dot products against the dequantized codes, block by block."""
+    queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, codes.shape[1])
+    out = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for i in range(0, len(codes), _BLOCK_ROWS):
+        out[:, i:i + _BLOCK_ROWS] = queries @ codes[i:i + _BLOCK_ROWS].astype(np.float32).T
+    return out * scales
+
+
+def two_stage_search(query_embeddings: np.ndarray, codes: np.ndarray, scales: np.ndarray,
+                     load_full, top_k: int, shortlist: int | None = None) -> list[list[tuple[int, float]]]:
+    """
+    (index, score) of the top_k rows per query, best first. Scores are exact
+    dot products (cosine for normalised vectors) of the reranked rows.
+    `load_full(indices) -> (len(indices), d)` returns full-precision vectors.
+    """
+    queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, codes.shape[1])
+    n = len(codes)
+    if n == 0:
+        return [[] for _ in queries]
+    keep = min(n, max(shortlist or SEARCH_SHORTLIST, top_k))
+
+    if keep < n:
+        approx = approximate_scores(queries, codes, scales)
+        candidates = np.argpartition(-approx, keep - 1, axis=1)[:, :keep]
+    else:
+        candidates = np.broadcast_to(np.arange(n), (len(queries), n))
+
+    rows = np.unique(candidates)
+    full = np.asarray(load_full(rows.tolist()), dtype=np.float32)
+    position = {int(r): i for i, r in enumerate(rows)}
+
+    results = []
+    for query, cand in zip(queries, candidates):
+        exact = full[[position[int(c)] for c in cand]] @ query
+        order = np.argsort(-exact)[:top_k]
+        results.append([(int(cand[i]), float(exact[i])) for i in order])
+    return results
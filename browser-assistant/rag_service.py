@@ -1,25 +1,27 @@
-import hashlib
-import json
+import logging
 import sqlite3
 import numpy as np
-import re
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
-DB_PATH = "rag_cache.db"
+from boilerplate import filter_boilerplate
+from context_packer import pack_context
+from embedding_service import load_embedding_model
+from observability import (stage, CACHE_HITS, CACHE_MISSES, CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED,
+                           BOILERPLATE_EXCLUDED, TAB_CHUNKS)
+from page_versions import tabs
+from quantization import quantize, two_stage_search, vector_to_blob, blob_to_vector
+from singleflight import SingleFlight
+from text_pipeline import compute_hash, preprocess_page
+
+logger = logging.getLogger(__name__)
 
-# Load embedding model once at startup (runs locally, no API key needed)
-print("[RAG] Loading embedding model...")
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-print("[RAG] Embedding model ready.")
+DB_PATH = "rag_cache.db"
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=50,
-    separators=["\n\n", "\n", ".", " ", ""]
-)
+# Load embedding model once at startup (runs locally, no API key needed),
+# or connect to the shared embedding worker when EMBEDDING_SOCKET is set
+embedding_model = load_embedding_model()
 
+_chunk_flights = SingleFlight("embed_chunks")
 
 # ── Database Setup ──────────────────────────────────────────────────────────
 
@@ -30,89 +32,137 @@ def get_db():
             hash        TEXT PRIMARY KEY,
             content     TEXT NOT NULL,
             embedding   TEXT NOT NULL,
-            created_at  DATETIME DEFAULT CURRENT_TIMESTAMP
+            created_at  DATETIME DEFAULT CURRENT_TIMESTAMP,
+            qvec        BLOB,
+            qscale      REAL
         )
     """)
+    add_quant_columns(conn, "chunks")
     conn.commit()
     return conn
 
 
-# ── Core Functions ──────────────────────────────────────────────────────────
+def add_quant_columns(conn: sqlite3.Connection, table: str):
+    """Add the int8 columns (qvec, qscale) to caches created before quantized storage."""
+    have = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column, kind in (("qvec", "BLOB"), ("qscale", "REAL")):
+        if column not in have:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+
+# ── Quantized Vectors ───────────────────────────────────────────────────────
+# `embedding` holds the full-precision vector (float32 blob; JSON text in rows
+# written before int8 storage), qvec/qscale the int8 codes and their scale.
+# Search reads the codes for every candidate and full vectors only for the
+# shortlist (see quantization.py).
+
+def load_quantized(conn: sqlite3.Connection, table: str,
+                   hashes: list[str]) -> dict[str, tuple[np.ndarray, float]]:
+    """hash → (int8 codes, scale) for the rows that exist; old rows are backfilled."""
+    found, legacy = {}, []
+    for i in range(0, len(hashes), 500):
+        batch = hashes[i:i + 500]
+        for h, qvec, qscale in conn.execute(
+            f"SELECT hash, qvec, qscale FROM {table} WHERE hash IN ({','.join('?' * len(batch))})",
+            batch
+        ):
+            if qvec is None:
+                legacy.append(h)
+            else:
+                found[h] = (np.frombuffer(qvec, dtype=np.int8), qscale)
+    if legacy:
+        found.update(backfill_quantized(conn, table, legacy))
+    return found
+
+
+def backfill_quantized(conn: sqlite3.Connection, table: str,
+                       hashes: list[str]) -> dict[str, tuple[np.ndarray, float]]:
+    """Quantize rows stored before int8 storage and rewrite their float vector as a blob."""
+    vectors = load_full_vectors(table, hashes, conn)
+    codes, scales = quantize(vectors)
+    conn.executemany(
+        f"UPDATE {table} SET embedding = ?, qvec = ?, qscale = ? WHERE hash = ?",
+        [(vector_to_blob(v), c.tobytes(), float(sc), h)
+         for h, v, c, sc in zip(hashes, vectors, codes, scales)]
+    )
+    conn.commit()
+    logger.info("Quantized %d %s rows written before int8 storage", len(hashes), table)
+    return {h: (c, float(sc)) for h, c, sc in zip(hashes, codes, scales)}
+
+
+def load_full_vectors(table: str, hashes: list[str],
+                      conn: sqlite3.Connection | None = None) -> np.ndarray:
+    """(len(hashes), d) float32 matrix of stored full-precision vectors, in order."""
+    own = conn is None
+    conn = conn or get_db()
+    vectors = {}
+    unique = list(dict.fromkeys(hashes))
+    for i in range(0, len(unique), 500):
+        batch = unique[i:i + 500]
+        for h, emb in conn.execute(
+            f"SELECT hash, embedding FROM {table} WHERE hash IN ({','.join('?' * len(batch))})",
+            batch
+        ):
+            vectors[h] = blob_to_vector(emb)
+    if own:
+        conn.close()
+    return np.array([vectors[h] for h in hashes], dtype=np.float32)
 
-def compute_hash(text: str) -> str:
-    return hashlib.sha256(text.strip().encode()).hexdigest()
 
+# ── Core Functions ──────────────────────────────────────────────────────────
 
 def embed_text(text: str) -> list[float]:
     return embedding_model.encode(text, normalize_embeddings=True).tolist()
 
 
-def split_text(content: str) -> list[str]:
-    return text_splitter.split_text(content)
-
-def clean_chunk(text: str) -> str:
-    text = text.strip()
-    # Remove leading dots, punctuation, bullets, dashes
-    text = re.sub(r'^[\.\,\;\:\!\?\-\–\—\•\·\*\s]+', '', text)
-    # Remove trailing incomplete citations like "^ " or ".[6]"
-    text = re.sub(r'\[\d+\]', '', text)        # remove [6] [7] etc
-    text = re.sub(r'\^\s*\w*', '', text)        # remove ^ footnote markers
-    # Remove lines that are purely citations/references (start with ISBN, DOI, p. )
-    lines = text.split('\n')
-    lines = [l for l in lines if not re.match(
-        r'^\s*(ISBN|DOI|doi|pp\.|p\.|S2CID|OCLC|PMID|Archived|Retrieved|Jump up)', l
-    )]
-    text = '\n'.join(lines).strip()
-    # Remove leading dots/punctuation again after line filtering
-    text = re.sub(r'^[\.\,\;\:\!\?\-\–\—\•\·\*\s]+', '', text)
-    return text
-
-
-def store_chunks(chunks: list[str], conn: sqlite3.Connection) -> list[dict]:
+def embed_chunks(items: list[dict], conn: sqlite3.Connection) -> list[dict]:
     """
-    For each chunk:
-      - Compute hash
-      - If hash exists in DB → fetch embedding
-      - If not → compute embedding, store in DB
-    Returns list of {hash, content, embedding}
+    Attach {hash, qvec, qscale} to already-cleaned chunk dicts (must have "content";
+    a precomputed "hash" is reused, other keys such as offsets are carried
+    through). Cached embeddings are read in one query; misses are embedded in
+    one batch and stored. Concurrent calls for the same set of chunks (several
+    tabs on one page) share a single lookup + encode.
     """
-    results = []
-
-    for chunk in chunks:
-        chunk = chunk.strip()
-        chunk = clean_chunk(chunk)
-        if not chunk:
-            continue
-
-        chunk_hash = compute_hash(chunk)
-
-        # Check if already cached
-        row = conn.execute(
-            "SELECT content, embedding FROM chunks WHERE hash = ?",
-            (chunk_hash,)
-        ).fetchone()
-
-        if row:
-            # Cache HIT - reuse stored embedding
-            embedding = json.loads(row[1])
-            print(f"[RAG] Cache HIT  | hash={chunk_hash[:8]}...")
-        else:
-            # Cache MISS - compute and store
-            embedding = embed_text(chunk)
-            conn.execute(
-                "INSERT INTO chunks (hash, content, embedding) VALUES (?, ?, ?)",
-                (chunk_hash, chunk, json.dumps(embedding))
-            )
-            conn.commit()
-            print(f"[RAG] Cache MISS | hash={chunk_hash[:8]}... | stored")
+    if not items:
+        return []
 
-        results.append({
-            "hash": chunk_hash,
-            "content": chunk,
-            "embedding": embedding
-        })
+    hashes = [item.get("hash") or compute_hash(item["content"]) for item in items]
+    contents = dict(zip(hashes, (item["content"] for item in items)))
+    quantized = _chunk_flights.do(compute_hash("".join(contents)), _load_or_embed, contents, conn)
+
+    return [
+        {**item, "hash": h, "qvec": quantized[h][0], "qscale": quantized[h][1]}
+        for h, item in zip(hashes, items)
+    ]
+
+
+def _load_or_embed(contents: dict[str, str],
+                   conn: sqlite3.Connection) -> dict[str, tuple[np.ndarray, float]]:
+    """hash → (int8 codes, scale) for every chunk in `contents`, embedding and storing misses."""
+    with stage("hash_lookup"):
+        cached = load_quantized(conn, "chunks", list(contents))
+
+    # Cache MISS - embed all new chunks in one batch and store
+    missing = {h: chunk for h, chunk in contents.items() if h not in cached}
+    if missing:
+        with stage("encode"):
+            vectors = embedding_model.encode(list(missing.values()), normalize_embeddings=True)
+        codes, scales = quantize(vectors)
+        new_rows = []
+        for h, chunk, vec, code, scale in zip(missing, missing.values(), vectors, codes, scales):
+            cached[h] = (code, float(scale))
+            new_rows.append((h, chunk, vector_to_blob(vec), code.tobytes(), float(scale)))
+        conn.executemany(
+            "INSERT OR IGNORE INTO chunks (hash, content, embedding, qvec, qscale) VALUES (?, ?, ?, ?, ?)",
+            new_rows
+        )
+        conn.commit()
 
-    return results
+    hits = len(contents) - len(missing)
+    CACHE_HITS.inc(hits, cache="chunks")
+    CACHE_MISSES.inc(len(missing), cache="chunks")
+    logger.debug("Chunk cache: %d hit, %d miss", hits, len(missing))
+    return cached
 
 
 def get_top_chunks(query: str, chunks: list[dict], top_k: int = 3) -> list[str]:
@@ -120,43 +170,187 @@ def get_top_chunks(query: str, chunks: list[dict], top_k: int = 3) -> list[str]:
     Embed the query, compute cosine similarity with all chunk embeddings,
     return top_k most relevant chunk contents.
     """
+    return [chunks[i]["content"] for i in rank_chunks(query, chunks, top_k)]
+
+
+def rank_chunks(query: str, chunks: list[dict], top_k: int = 3) -> list[int]:
+    """Indices of the top_k chunks most similar to the query, best first."""
     if not chunks:
         return []
+    return [i for i, _ in score_chunks(embed_query(query), chunks, top_k)]
+
+
+def embed_query(query: str) -> np.ndarray:
+    with stage("encode"):
+        return np.asarray(embedding_model.encode(query, normalize_embeddings=True))
+
+
+def score_chunks(query_embedding: np.ndarray, chunks: list[dict],
+                 top_k: int = 3, matrix: tuple | None = None) -> list[tuple[int, float]]:
+    """(index, cosine score) of the top_k chunks, best first."""
+    return score_chunks_batch(query_embedding.reshape(1, -1), chunks, top_k, matrix)[0]
+
 
-    query_embedding = np.array(embed_text(query)).reshape(1, -1)
-    chunk_embeddings = np.array([c["embedding"] for c in chunks])
+def score_chunks_batch(query_embeddings: np.ndarray, chunks: list[dict], top_k: int = 3,
+                       matrix: tuple | None = None) -> list[list[tuple[int, float]]]:
+    """
+    score_chunks for many queries at once. Two stages: int8 scores for every
+    chunk, then the shortlist reranked against full-precision vectors.
+    `matrix` is a prebuilt (codes, scales) for `chunks`; otherwise it is
+    stacked from each chunk's qvec/qscale.
+    """
+    if not chunks:
+        return [[] for _ in range(len(query_embeddings))]
+    with stage("similarity"):
+        if matrix is None:
+            matrix = (np.stack([c["qvec"] for c in chunks]),
+                      np.array([c["qscale"] for c in chunks], dtype=np.float32))
+        codes, scales = matrix
+        ranked = two_stage_search(
+            query_embeddings, codes, scales,
+            lambda rows: load_full_vectors("chunks", [chunks[i]["hash"] for i in rows]),
+            top_k,
+        )
+
+    logger.debug("Top scores: %s", [[round(s, 3) for _, s in r] for r in ranked])
+    return ranked
 
-    scores = cosine_similarity(query_embedding, chunk_embeddings)[0]
-    top_indices = np.argsort(scores)[::-1][:top_k]
 
-    print(f"[RAG] Top scores: {[round(scores[i], 3) for i in top_indices]}")
+def _embed_sentences(sentences: list[str]) -> np.ndarray:
+    with stage("encode"):
+        return embedding_model.encode(sentences, normalize_embeddings=True)
 
-    return [chunks[i]["content"] for i in top_indices]
+
+def _memo_embed():
+    """_embed_sentences with a per-call cache, so questions sharing chunks encode each sentence once."""
+    cache: dict[str, np.ndarray] = {}
+
+    def embed(sentences: list[str]) -> np.ndarray:
+        new = [s for s in dict.fromkeys(sentences) if s not in cache]
+        if new:
+            cache.update(zip(new, _embed_sentences(new)))
+        return np.array([cache[s] for s in sentences])
+    return embed
 
 
 # ── Main Entry Point ────────────────────────────────────────────────────────
 
-def process_page_and_query(page_content: str, query: str, top_k: int = 3) -> str:
+def process_page_and_query(page_content: str, query: str, top_k: int = 3,
+                           token_budget: int | None = None, page_url: str = "",
+                           tab_id: str = "") -> tuple[str, list[str], list[list[int]]]:
     """
     Full RAG pipeline:
-    1. Split page into chunks
+    1. Split + clean + hash page into chunks, keeping their offsets into page_content
+       (sharded across worker processes for very large pages)
+    1a. With tab_id, only the parts that changed since the tab's previous
+       version are re-chunked and embedded (see page_versions.py)
+    1b. With page_url, drop chunks seen on many pages of the same domain
+       (menus, banners, footers; see boilerplate.py)
     2. Hash check → embed + store or retrieve
     3. Find top_k chunks relevant to query
-    4. Return joined context string
+    4. Return context string, the chunk texts, and their [start, end) spans.
+       With token_budget the context is packed (see context_packer),
+       otherwise it is the chunks joined in score order.
     """
-    conn = get_db()
-    print(f"Page Content \n\n {page_content}")
-    chunks = split_text(page_content)
-    print(f"[RAG] Page split into {len(chunks)} chunks")
+    stored, matrix = _embed_page(page_content, page_url, tab_id)
+    query_embedding = embed_query(query) if stored else None
+    ranked = score_chunks(query_embedding, stored, top_k, matrix) if stored else []
+    return _build_context(page_content, stored, ranked, token_budget,
+                          query_embedding, _embed_sentences)
 
-    stored = store_chunks(chunks, conn)
+
+def process_page_and_queries(page_content: str, queries: list[str], top_k: int = 3,
+                             token_budget: int | None = None, page_url: str = "",
+                             tab_id: str = "") -> list[tuple[str, list[str], list[list[int]]]]:
+    """
+    process_page_and_query for several questions about one page. The page is
+    chunked and embedded once, all questions are encoded in one batch and
+    scored with one matrix product, and sentences shared between questions'
+    contexts are encoded once. Returns one (context, contents, spans) per query.
+    """
+    stored, matrix = _embed_page(page_content, page_url, tab_id)
+    if not stored or not queries:
+        return [("", [], []) for _ in queries]
+
+    with stage("encode"):
+        query_embeddings = np.asarray(embedding_model.encode(queries, normalize_embeddings=True))
+    ranked = score_chunks_batch(query_embeddings, stored, top_k, matrix)
+    embed = _memo_embed()
+    return [
+        _build_context(page_content, stored, r, token_budget, q, embed)
+        for r, q in zip(ranked, query_embeddings)
+    ]
+
+
+def _embed_page(page_content: str, page_url: str = "",
+                tab_id: str = "") -> tuple[list[dict], tuple | None]:
+    """(chunks with embeddings, prebuilt (codes, scales) matrix or None)."""
+    conn = get_db()
+    if tab_id:
+        stored, matrix = _embed_tab_page(tab_id, page_content, conn)
+    else:
+        with stage("split"):
+            stored, matrix = preprocess_page(page_content), None
+
+    excluded = 0
+    if page_url:
+        with stage("boilerplate"):
+            kept, excluded = filter_boilerplate(page_url, stored, compute_hash(page_content), conn)
+        BOILERPLATE_EXCLUDED.inc(excluded)
+        if excluded and matrix is not None:
+            keep = {id(c) for c in kept}
+            rows = [i for i, c in enumerate(stored) if id(c) in keep]
+            matrix = (matrix[0][rows], matrix[1][rows])
+        stored = kept
+    logger.info("Page of %d chars split into %d chunks (%d boilerplate excluded)",
+                len(page_content), len(stored) + excluded, excluded)
+
+    if not tab_id:
+        stored = embed_chunks(stored, conn)
     conn.close()
+    return stored, matrix
 
-    top_contents = get_top_chunks(query, stored, top_k=top_k)
 
-    context = "\n\n---\n\n".join(top_contents)
-    # print(f"top content : {top_contents}")
-    return context, top_contents
+def _embed_tab_page(tab_id: str, page_content: str,
+                    conn: sqlite3.Connection) -> tuple[list[dict], tuple]:
+    """
+    Patch the tab's retained chunks and matrix to this page version. Boilerplate
+    is filtered after this, so in the tab path it is embedded (usually a cache
+    hit) but still kept out of ranking.
+    """
+    tab = tabs.get(tab_id)
+    with tab.lock:
+        with stage("tab_update"):   # includes hash_lookup/encode of the re-chunked chunks
+            stats = tab.update(page_content, lambda chunks: embed_chunks(chunks, conn))
+        stored, matrix = list(tab.chunks), tab.matrix()
+    TAB_CHUNKS.inc(stats["kept"], result="reused")
+    TAB_CHUNKS.inc(stats["rechunked"], result="rechunked")
+    logger.info("Tab %s: %d chunks reused, %d re-chunked (%d chars changed)",
+                tab_id[:8], stats["kept"], stats["rechunked"], stats["changed_chars"])
+    return stored, matrix
+
+
+def _build_context(page_content: str, stored: list[dict], ranked: list[tuple[int, float]],
+                   token_budget: int | None, query_embedding: np.ndarray | None,
+                   embed) -> tuple[str, list[str], list[list[int]]]:
+    top = [i for i, _ in ranked]
+    top_contents = [stored[i]["content"] for i in top]
+    top_spans = [[stored[i]["start"], stored[i]["end"]] for i in top]
+
+    if token_budget is None:
+        context = "\n\n---\n\n".join(top_contents)
+    else:
+        with stage("pack"):
+            context, stats = pack_context(
+                page_content, [stored[i] for i in top], [s for _, s in ranked],
+                token_budget, query_embedding, embed=embed,
+            )
+        CONTEXT_TOKENS.observe(stats["tokens"], endpoint="chat")
+        CONTEXT_TOKENS_SAVED.inc(max(0, stats["raw_tokens"] - stats["tokens"]), endpoint="chat")
+        logger.info("Packed %d chunks into %d blocks: ~%d tokens (unpacked ~%d), %d sentences dropped",
+                    stats["chunks"], stats["blocks"], stats["tokens"], stats["raw_tokens"],
+                    stats["dropped_sentences"])
+    return context, top_contents, top_spans
 
 
 def find_best_source(answer: str, source_chunks: list[str]) -> int:
@@ -169,10 +363,30 @@ def find_best_source(answer: str, source_chunks: list[str]) -> int:
     if len(source_chunks) == 1:
         return 0
 
-    answer_emb  = np.array(embed_text(answer)).reshape(1, -1)
-    source_embs = np.array([embed_text(chunk) for chunk in source_chunks])
-    scores      = cosine_similarity(answer_emb, source_embs)[0]
+    with stage("best_source"):
+        answer_emb  = np.array(embed_text(answer)).reshape(1, -1)
+        source_embs = np.array([embed_text(chunk) for chunk in source_chunks])
+        scores      = cosine_similarity(answer_emb, source_embs)[0]
 
     best_idx = int(np.argmax(scores))
-    print(f"[RAG] Best source index: {best_idx} | scores: {[round(s,3) for s in scores]}")
-    return best_idx
\ No newline at end of file
+    logger.debug("Best source index: %d | scores: %s", best_idx, [round(float(s), 3) for s in scores])
+    return best_idx
+
+
+def find_best_sources(answers: list[str], sources: list[list[str]]) -> list[int]:
+    """find_best_source for many answers, with one encode for all answers and sources."""
+    if not answers:
+        return []
+    texts = list(dict.fromkeys(answers + [c for chunks in sources for c in chunks]))
+    with stage("best_source"):
+        vectors = np.asarray(embedding_model.encode(texts, normalize_embeddings=True))
+    row = {t: i for i, t in enumerate(texts)}
+
+    best = []
+    for answer, chunks in zip(answers, sources):
+        if len(chunks) <= 1:
+            best.append(0)
+            continue
+        scores = vectors[[row[c] for c in chunks]] @ vectors[row[answer]]
+        best.append(int(np.argmax(scores)))
+    return best
@@ -0,0 +1,57 @@
+"""
+Keyed single-flight: concurrent callers with the same key share one execution.
+
+    transcripts = SingleFlight("transcript")
+    entries = transcripts.do(video_id, _fetch, video_id)
+
+The first caller for a key runs the function. Callers that arrive while it is
+running block until it finishes and get the same result (or exception). The
+result object is shared, so callers must not mutate it. Nothing is cached:
+once the call returns, the next caller runs it again. Counts of executions
+and coalesced callers go to /metrics, labelled by flight name.
+"""
+import threading
+
+from observability import SINGLEFLIGHT_CALLS, SINGLEFLIGHT_COALESCED
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_COALESCED.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLEFLIGHT_CALLS.inc(flight=self.name)
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,23 @@
+"""Prices the refresher extracts must parse to the amount on the page."""
+import pytest
+
+from price_refresher import extract_price_from_html
+from price_service import parse_price
+
+
+@pytest.mark.parametrize("text, amount", [
+    ("Rs.1,299", 1299.0),
+    ("Rs. 1,299.50", 1299.5),
+    ("MRP:rs.499", 499.0),
+    ("₹1,23,456", 123456.0),
+    ("$12.99", 12.99),
+])
+def test_parse_price(text, amount):
+    assert parse_price(text) == amount
+
+
+def test_extracted_rs_price_parses_cleanly():
+    html = '<h1>Kettle</h1><span class="price">Rs. 1,299</span>'
+    title, price_str = extract_price_from_html(html, "https://shop.example/kettle")
+    assert title == "Kettle"
+    assert parse_price(price_str) == 1299.0
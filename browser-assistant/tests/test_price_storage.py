@@ -0,0 +1,45 @@
+"""Row storage and run storage must chart the same history."""
+import shutil
+from datetime import datetime, timedelta
+
+import price_service
+
+URL = "https://shop.example/item/1"
+
+
+def _rows_db(path, observations):
+    """prices.db in row storage holding (price, recorded_at) observations for URL."""
+    price_service.DB_PATH = str(path)
+    price_service.PRICE_STORAGE = "rows"
+    conn = price_service.get_db()
+    conn.executemany("""
+        INSERT INTO price_history (url, domain, title, price, currency, recorded_at)
+        VALUES (?, 'shop.example', 'Item', ?, '₹', ?)
+    """, [(URL, price, at.strftime("%Y-%m-%d %H:%M:%S")) for price, at in observations])
+    conn.execute("DELETE FROM price_summary")
+    conn.commit()
+    conn.close()
+    price_service._summary_ready.discard(str(path))
+
+
+def _history(path, mode):
+    price_service.DB_PATH = str(path)
+    price_service.PRICE_STORAGE = mode
+    return price_service.get_price_history(URL)
+
+
+def test_runs_bucket_like_rows_across_gaps(tmp_path):
+    start = datetime(2024, 1, 1)
+    observations = [(100.0, start + timedelta(hours=h)) for h in range(100)]
+    observations += [(100.0, start + timedelta(days=200)),
+                     (90.0, start + timedelta(days=201, hours=5))]
+    _rows_db(tmp_path / "rows.db", observations)
+    shutil.copy(tmp_path / "rows.db", tmp_path / "runs.db")
+
+    rows = _history(tmp_path / "rows.db", "rows")
+    runs = _history(tmp_path / "runs.db", "runs")
+
+    assert rows["resolution"] == runs["resolution"] == "weekly"
+    assert len(rows["history"]) == 3
+    assert runs == rows
+
@@ -0,0 +1,248 @@
+"""
+Offset-preserving chunking and cleaning for page text.
+
+chunk_page() walks the page once, picks break points with plain str.rfind
+(paragraph → line → sentence → word), and cleans each chunk with a couple of
+precompiled patterns that the regex engine can scan quickly. Every chunk keeps
+the [start, end) character offsets of its text in the original `context`, so
+the extension can highlight sources directly.
+
+preprocess_page() adds content hashes and, for pages of at least
+PREPROCESS_PARALLEL_MIN_CHARS, cuts the page into shards at paragraph breaks
+and chunks, cleans and hashes them in a process pool, so multi-megabyte pages
+don't hold the API process's GIL. Results are merged in page order with
+offsets into the full page. Below the threshold, or with PREPROCESS_WORKERS=0,
+everything stays in-process. The pool is forked on the first oversized page,
+so API processes that never see one (most of them, under uvicorn --workers)
+never pay for it.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE    = 500
+CHUNK_OVERLAP = 50
+SEPARATORS    = ("\n\n", "\n", ". ", " ")
+MIN_BREAK     = CHUNK_SIZE // 4   # don't break so early that chunks become tiny
+
+# A pool on a single core only adds pickling on top of the same work: off there
+PREPROCESS_WORKERS            = int(os.getenv("PREPROCESS_WORKERS",
+                                              2 if (os.cpu_count() or 1) >= 2 else 0))
+PREPROCESS_PARALLEL_MIN_CHARS = int(os.getenv("PREPROCESS_PARALLEL_MIN_CHARS", 1_000_000))
+SHARD_CHARS                   = 250_000   # target shard size; at least one shard per worker
+
+# Citation/reference lines. Anchored on a literal "\n" (clean_text prepends
+# one) rather than (?m)^, so the regex engine can skip ahead to newlines
+# instead of trying the keyword alternation at every character.
+_CITATION_LINE = re.compile(
+    r"\n[ \t]*(?:ISBN|DOI|doi|pp\.|p\.|S2CID|OCLC|PMID|Archived|Retrieved|Jump up)[^\n]*"
+)
+# [6]-style markers and ^ footnote markers
+_MARKERS = re.compile(r"\[\d+\]|\^\s*\w*")
+# Leading whitespace, dots, punctuation, bullets, dashes
+_LEADING = re.compile(r"^[\s.,;:!?\-–—•·*]+")
+
+
+def clean_text(text: str) -> str:
+    """Strip citation markers, reference lines and leading punctuation in ≤ 3 regex passes."""
+    # Markers go first: "[12] Retrieved ..." is a citation line
+    if "[" in text or "^" in text:
+        text = _MARKERS.sub("", text)
+    text = _CITATION_LINE.sub("", "\n" + text)
+    return _LEADING.sub("", text).rstrip()
+
+
+def split_offsets(text: str, chunk_size: int = CHUNK_SIZE,
+                  overlap: int = CHUNK_OVERLAP) -> list[tuple[int, int]]:
+    """[start, end) spans of ≤ chunk_size chars, consecutive spans overlapping by ~overlap."""
+    n = len(text)
+    spans = []
+    start = _skip_space(text, 0, n)
+    while start < n:
+        stop, nxt = next_span(text, start, chunk_size, overlap)
+        if stop > start:
+            spans.append((start, stop))
+        start = nxt
+    return spans
+
+
+def next_span(text: str, start: int, chunk_size: int = CHUNK_SIZE,
+              overlap: int = CHUNK_OVERLAP) -> tuple[int, int]:
+    """
+    One step of split_offsets from `start`: (end of this span, start of the
+    next one, or len(text) when done). Reads only text[start:start + chunk_size]
+    and the whitespace up to the next start.
+    """
+    n = len(text)
+    end = min(start + chunk_size, n)
+    if end < n:
+        end = _break_point(text, start, end, min(MIN_BREAK, chunk_size // 4))
+
+    stop = end
+    while stop > start and text[stop - 1].isspace():
+        stop -= 1
+    if end >= n:
+        return stop, n
+
+    # Overlap: restart `overlap` chars back, at the next word boundary
+    nxt = end - overlap
+    if nxt <= start:
+        nxt = end
+    else:
+        space = text.find(" ", nxt, end)
+        nxt = end if space == -1 else space + 1
+    return stop, _skip_space(text, nxt, n)
+
+
+def chunk_page(text: str, chunk_size: int = CHUNK_SIZE,
+               overlap: int = CHUNK_OVERLAP) -> list[dict]:
+    """
+    Split and clean `text` in one pass.
+    Returns [{content, start, end}], where text[start:end] is the raw region
+    the cleaned `content` came from. Chunks that clean to nothing are dropped.
+    """
+    chunks = []
+    for start, end in split_offsets(text, chunk_size, overlap):
+        chunk = make_chunk(text, start, end)
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+def make_chunk(text: str, start: int, end: int) -> dict | None:
+    """{content, start, end} for the span, or None if it cleans to nothing."""
+    raw = text[start:end]
+    content = clean_text(raw)
+    if not content:
+        return None
+    lead = _LEADING.match(raw)
+    if lead:
+        start += lead.end()
+    return {"content": content, "start": start, "end": end}
+
+
+def _break_point(text: str, start: int, end: int, min_break: int) -> int:
+    """Latest separator inside the window, preferring coarser separators."""
+    lo = start + min_break
+    for sep in SEPARATORS:
+        pos = text.rfind(sep, lo, end)
+        if pos != -1:
+            return pos + len(sep)
+    return end
+
+
+def _skip_space(text: str, i: int, n: int) -> int:
+    while i < n and text[i].isspace():
+        i += 1
+    return i
+
+
+def compute_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode()).hexdigest()
+
+
+# ── Parallel preprocessing ──────────────────────────────────────────────────
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def preprocess_page(text: str) -> list[dict]:
+    """
+    chunk_page() plus a "hash" per chunk and its chunker step ("at": where
+    the walk was, "next": where it went on), sharded across processes for
+    large pages.
+    """
+    pool = _get_pool() if len(text) >= PREPROCESS_PARALLEL_MIN_CHARS else None
+    if pool is None:
+        return _chunk_and_hash(text, 0)
+
+    bounds = shard_bounds(text, max(PREPROCESS_WORKERS, -(-len(text) // SHARD_CHARS)))
+    results = pool.map(_shard_rows, [text[a:b] for a, b in bounds], [a for a, _ in bounds])
+    return [
+        {"content": content, "start": start, "end": end, "hash": h, "at": at, "next": nxt}
+        for rows in results for content, start, end, h, at, nxt in rows
+    ]
+
+
+def shard_bounds(text: str, shards: int) -> list[tuple[int, int]]:
+    """Cut text into ~equal [start, end) shards, at a paragraph or line break where possible."""
+    n = len(text)
+    bounds, start = [], 0
+    for i in range(1, shards):
+        target = i * n // shards
+        if target <= start:
+            continue
+        window = max(CHUNK_SIZE * 4, n // (shards * 8))
+        cut = -1
+        for sep in ("\n\n", "\n"):
+            cut = text.rfind(sep, max(start + 1, target - window), target)
+            if cut != -1:
+                cut += len(sep)
+                break
+        if cut == -1:
+            cut = target
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, n))
+    return bounds
+
+
+def start_pool():
+    """Fork the preprocessing workers now instead of on the first oversized page (benchmarks)."""
+    pool = _get_pool()
+    if pool is not None:
+        pool.submit(len, "").result()
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    # fork, not spawn: spawned workers would re-import main.py and load the model.
+    # Forking from a busy process is safe here: workers only run _shard_rows
+    # (str, re, hashlib) and never touch locks other threads may have held.
+    global _pool
+    if PREPROCESS_WORKERS <= 0 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(PREPROCESS_WORKERS,
+                                        mp_context=multiprocessing.get_context("fork"))
+            logger.info("Started %d preprocessing workers", PREPROCESS_WORKERS)
+        return _pool
+
+
+def _shard_rows(text: str, offset: int) -> list[tuple]:
+    # Tuples pickle back to the parent much faster than dicts
+    return [(c["content"], c["start"], c["end"], c["hash"], c["at"], c["next"])
+            for c in _chunk_and_hash(text, offset)]
+
+
+def _chunk_and_hash(text: str, offset: int) -> list[dict]:
+    # split_offsets + chunk_page, keeping each step's walk positions
+    chunks = []
+    n = len(text)
+    start = _skip_space(text, 0, n)
+    while start < n:
+        stop, nxt = next_span(text, start)
+        chunk = make_chunk(text, start, stop) if stop > start else None
+        if chunk:
+            chunk["start"] += offset
+            chunk["end"] += offset
+            chunk["hash"] = compute_hash(chunk["content"])
+            chunk["at"], chunk["next"] = start + offset, nxt + offset
+            chunks.append(chunk)
+        start = nxt
+    return chunks
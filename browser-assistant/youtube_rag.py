@@ -1,15 +1,21 @@
 import hashlib
-import json
+import logging
 import sqlite3
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 
 # Reuse same embedding model as rag_service
-from rag_service import embedding_model, get_db
+from rag_service import (embedding_model, get_db, add_quant_columns, load_quantized,
+                         backfill_quantized, load_full_vectors)
+from quantization import quantize, two_stage_search, vector_to_blob
+from observability import stage, CACHE_HITS, CACHE_MISSES
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "rag_cache.db"
 
+_store_flights = SingleFlight("store_youtube_chunks")
+
 
 def ensure_youtube_table():
     conn = get_db()
@@ -21,9 +27,12 @@ def ensure_youtube_table():
             start_time  REAL NOT NULL,
             end_time    REAL NOT NULL,
             ts_label    TEXT NOT NULL,
-            embedding   TEXT NOT NULL
+            embedding   TEXT NOT NULL,
+            qvec        BLOB,
+            qscale      REAL
         )
     """)
+    add_quant_columns(conn, "youtube_chunks")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_vid ON youtube_chunks(video_id)")
     conn.commit()
     conn.close()
@@ -34,48 +43,58 @@ def chunk_hash(video_id: str, start_time: float) -> str:
 
 
 def store_youtube_chunks(video_id: str, chunks: list[dict]) -> list[dict]:
-    """Store timed chunks with embeddings, using hash cache."""
+    """Store timed chunks with embeddings, using hash cache.
+    Concurrent loads of the same video run once."""
+    return _store_flights.do(video_id, _store_youtube_chunks, video_id, chunks)
+
+
+def _store_youtube_chunks(video_id: str, chunks: list[dict]) -> list[dict]:
     ensure_youtube_table()
     conn = get_db()
-    results = []
-    
+
     if video_id:
         row = conn.execute(
             "SELECT * FROM youtube_chunks WHERE video_id = ?", (video_id,)
         ).fetchone()
         
         if row: 
-            print(f"[YT-RAG] Video found")
+            logger.info("Video %s already stored", video_id)
+            conn.close()
             return []
-        
-    for chunk in chunks:
-        h = chunk_hash(video_id, chunk["start_time"])
 
-        row = conn.execute(
-            "SELECT embedding FROM youtube_chunks WHERE hash = ?", (h,)
-        ).fetchone()
-
-        if row:
-            embedding = json.loads(row[0])
-            print(f"[YT-RAG] Cache HIT  | {chunk['timestamp_label']}")
-        else:
-            embedding = embedding_model.encode(
-                chunk["text"], normalize_embeddings=True
-            ).tolist()
-            conn.execute("""
-                INSERT INTO youtube_chunks
-                  (hash, video_id, text, start_time, end_time, ts_label, embedding)
-                VALUES (?,?,?,?,?,?,?)
-            """, (
+    with stage("hash_lookup"):
+        hashes = [chunk_hash(video_id, chunk["start_time"]) for chunk in chunks]
+        cached = load_quantized(conn, "youtube_chunks", hashes)
+
+    missing = [(h, chunk) for h, chunk in zip(hashes, chunks) if h not in cached]
+    if missing:
+        with stage("encode"):
+            vectors = embedding_model.encode(
+                [chunk["text"] for _, chunk in missing], normalize_embeddings=True
+            )
+        codes, scales = quantize(vectors)
+        rows = []
+        for (h, chunk), vec, code, scale in zip(missing, vectors, codes, scales):
+            cached[h] = (code, float(scale))
+            rows.append((
                 h, video_id,
                 chunk["text"], chunk["start_time"], chunk["end_time"],
-                chunk["timestamp_label"], json.dumps(embedding)
+                chunk["timestamp_label"], vector_to_blob(vec), code.tobytes(), float(scale)
             ))
-            conn.commit()
-            print(f"[YT-RAG] Cache MISS | {chunk['timestamp_label']} stored")
-
-        results.append({**chunk, "embedding": embedding})
-
+        conn.executemany("""
+            INSERT OR IGNORE INTO youtube_chunks
+              (hash, video_id, text, start_time, end_time, ts_label, embedding, qvec, qscale)
+            VALUES (?,?,?,?,?,?,?,?,?)
+        """, rows)
+        conn.commit()
+
+    CACHE_HITS.inc(len(chunks) - len(missing), cache="youtube")
+    CACHE_MISSES.inc(len(missing), cache="youtube")
+    logger.info("Stored %d transcript chunks for %s (%d newly embedded)",
+                len(chunks), video_id, len(missing))
+
+    results = [{**chunk, "hash": h, "qvec": cached[h][0], "qscale": cached[h][1]}
+               for h, chunk in zip(hashes, chunks)]
     conn.close()
     return results
 
@@ -85,32 +104,54 @@ def query_youtube(video_id: str, query: str, top_k: int = 3) -> list[dict]:
     Get top_k most relevant chunks for a query.
     Returns list of {text, start_time, end_time, ts_label, score}
     """
-    ensure_youtube_table()
-    conn = get_db()
+    return query_youtube_batch(video_id, [query], top_k)[0]
 
-    rows = conn.execute(
-        "SELECT text, start_time, end_time, ts_label, embedding FROM youtube_chunks WHERE video_id = ?",
-        (video_id,)
-    ).fetchall()
-    conn.close()
 
-    if not rows:
-        return []
+def query_youtube_batch(video_id: str, queries: list[str], top_k: int = 3) -> list[list[dict]]:
+    """
+    query_youtube for several questions: the video's chunks are loaded once,
+    the queries encoded in one batch and scored with one matrix product.
+    """
+    ensure_youtube_table()
+    conn = get_db()
 
-    query_emb = embedding_model.encode(query, normalize_embeddings=True).reshape(1, -1)
-    embeddings = np.array([json.loads(r[4]) for r in rows])
-    scores     = cosine_similarity(query_emb, embeddings)[0]
-    top_idx    = np.argsort(scores)[::-1][:top_k]
+    with stage("hash_lookup"):
+        rows = conn.execute(
+            "SELECT hash, text, start_time, end_time, ts_label, qvec, qscale FROM youtube_chunks WHERE video_id = ?",
+            (video_id,)
+        ).fetchall()
+
+        if not rows or not queries:
+            conn.close()
+            return [[] for _ in queries]
+        legacy = [r[0] for r in rows if r[5] is None]
+        backfilled = backfill_quantized(conn, "youtube_chunks", legacy) if legacy else {}
+        conn.close()
+        quantized = [backfilled[r[0]] if r[5] is None else (np.frombuffer(r[5], dtype=np.int8), r[6])
+                     for r in rows]
+        codes = np.stack([q[0] for q in quantized])
+        scales = np.array([q[1] for q in quantized], dtype=np.float32)
+
+    with stage("encode"):
+        query_embs = np.asarray(embedding_model.encode(queries, normalize_embeddings=True))
+    with stage("similarity"):
+        ranked = two_stage_search(
+            query_embs, codes, scales,
+            lambda idx: load_full_vectors("youtube_chunks", [rows[i][0] for i in idx]),
+            top_k,
+        )
 
     results = []
-    for i in top_idx:
-        r = rows[i]
-        results.append({
-            "text":       r[0],
-            "start_time": r[1],
-            "end_time":   r[2],
-            "ts_label":   r[3],
-            "score":      round(float(scores[i]), 3),
-        })
-
-    return results
\ No newline at end of file
+    for matches in ranked:
+        results.append([
+            {
+                "text":       rows[i][1],
+                "start_time": rows[i][2],
+                "end_time":   rows[i][3],
+                "ts_label":   rows[i][4],
+                "score":      round(score, 3),
+            }
+            for i, score in matches
+        ])
+
+    return results
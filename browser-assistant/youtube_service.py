@@ -1,6 +1,19 @@
 from youtube_transcript_api import YouTubeTranscriptApi
+import httpx
+import logging
+import os
 import re
 
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Fetch transcripts from a JSON service instead of YouTube (local stub for load
+# tests): GET {TRANSCRIPT_API_URL}/transcripts/{video_id} → {"snippets": [...]}
+TRANSCRIPT_API_URL = os.getenv("TRANSCRIPT_API_URL")
+
+_transcript_flights = SingleFlight("fetch_transcript")
+
 
 def extract_video_id(url: str) -> str | None:
     """Extract YouTube video ID from any YouTube URL format."""
@@ -18,29 +31,46 @@ def fetch_transcript(video_id: str) -> list[dict] | None:
     """
     Fetch transcript using youtube_transcript_api.
     Returns list of {text, start, duration} dicts.
+    Concurrent fetches of the same video share one request.
     """
+    return _transcript_flights.do(video_id, _fetch_transcript, video_id)
+
+
+def _fetch_transcript(video_id: str) -> list[dict] | None:
     try:
-        api = YouTubeTranscriptApi()
-        response = api.fetch(video_id=video_id, languages=["en", "hi"])
+        if TRANSCRIPT_API_URL:
+            snippets = _fetch_from_transcript_api(video_id)
+        else:
+            api = YouTubeTranscriptApi()
+            snippets = [
+                {"text": s.text, "start": s.start, "duration": s.duration}
+                for s in api.fetch(video_id=video_id, languages=["en", "hi"]).snippets
+            ]
 
         entries = []
-        for snippet in response.snippets:
-            text = snippet.text.strip()
+        for snippet in snippets:
+            text = snippet["text"].strip()
             if not text:
                 continue
             entries.append({
                 "text":     text,
-                "start":    round(snippet.start, 2),
-                "duration": round(snippet.duration, 2),
+                "start":    round(snippet["start"], 2),
+                "duration": round(snippet["duration"], 2),
             })
 
         return entries if entries else None
 
     except Exception as e:
-        print(f"[YouTube] Transcript fetch error: {e}")
+        logger.warning("Transcript fetch error for %s: %s", video_id, e)
         return None
 
 
+def _fetch_from_transcript_api(video_id: str) -> list[dict]:
+    resp = httpx.get(f"{TRANSCRIPT_API_URL}/transcripts/{video_id}", timeout=30)
+    resp.raise_for_status()
+    return resp.json()["snippets"]
+
+
 def format_timestamp(seconds: float) -> str:
     """Convert seconds to MM:SS or HH:MM:SS format."""
     seconds = int(seconds)
@@ -118,6 +118,10 @@
       const source = clone;
       const raw = source.innerText || source.textContent || "";
 
+      // Index the live page's text nodes now, so source clicks can map
+      // spans without walking the DOM
+      window.__Highlighter__?.reindex();
+
       return raw
         .replace(/\t/g, " ")
         .replace(/[ ]{2,}/g, " ")
@@ -141,6 +145,17 @@
 
     pageContext = extractPageContent();
 
+    // Per-tab id so the server can re-ingest only what changed between turns.
+    // sessionStorage is per tab and survives same-tab navigation and reloads.
+    function getTabId() {
+      let id = sessionStorage.getItem("__web_chat_ai_tab__");
+      if (!id) {
+        id = crypto.randomUUID();
+        sessionStorage.setItem("__web_chat_ai_tab__", id);
+      }
+      return id;
+    }
+
     // ── Dynamic Suggestion Chips ─────────────────────────────────
     function detectPageType() {
       const url  = window.location.href.toLowerCase();
@@ -219,7 +234,8 @@
     }
 
     // ── Add message bubble ───────────────────────────────────────
-    function addMessage(content, type = "ai", sources = [], bestSourceIdx = 0) {
+    function addMessage(content, type = "ai", sources = [], bestSourceIdx = 0,
+                        sourceSpans = [], sourceContext = "") {
       const empty = messagesEl.querySelector(".__chat_empty__");
       if (empty) empty.remove();
 
@@ -263,7 +279,13 @@
 
           if (isActive) {
             const bestSource = sources[bestSourceIdx] || sources[0];
-            const found = window.__Highlighter__?.highlight(bestSource);
+            // Prefer the exact [start, end) region of the context we sent;
+            // fall back to fuzzy phrase matching on the cleaned chunk.
+            const span = sourceSpans[bestSourceIdx];
+            const found =
+              (span && sourceContext &&
+                window.__Highlighter__?.highlightRegion(sourceContext.slice(span[0], span[1]))) ||
+              window.__Highlighter__?.highlight(bestSource);
             if (found) {
               sourceBtn.classList.add("active");
               sourceBtn.innerHTML = `✕ Clear highlight`;
@@ -311,6 +333,19 @@
       messagesEl.querySelector("#__typing_indicator__")?.remove();
     }
 
+    // ── Server error text (429 → "busy, retry in Ns") ─────────────
+    async function serverErrorMessage(res) {
+      if (res.status === 429) {
+        const retry = res.headers.get("Retry-After") ||
+          (await res.json().catch(() => ({}))).retry_after;
+        return `The AI is busy right now. Try again${retry ? ` in ${retry}s` : " shortly"}.`;
+      }
+      if (res.status === 503) {
+        return "The AI service didn't respond in time. Please try again.";
+      }
+      return `Server error: ${res.status}`;
+    }
+
     // ── Send message ─────────────────────────────────────────────
     async function sendMessage() {
       const text = inputEl.value.trim();
@@ -335,19 +370,29 @@
         }
         // ── Normal mode ───────────────────────────────────────────
         else {
+          // Live pages change between turns; re-read so answers see the latest text.
+          pageContext = extractPageContent();
+          const sentContext = pageContext;
           const res = await fetch("http://localhost:8090/chat", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ message: text, context: pageContext }),
+            body: JSON.stringify({
+              message: text,
+              context: sentContext,
+              page_url: window.location.href,
+              tab_id: getTabId(),
+            }),
           });
-          if (!res.ok) throw new Error(`Server error: ${res.status}`);
+          if (!res.ok) throw new Error(await serverErrorMessage(res));
           const data = await res.json();
           removeTyping();
           addMessage(
             data.answer || "No response received.",
             "ai",
             data.sources || [],
-            data.best_source_idx || 0
+            data.best_source_idx || 0,
+            data.source_spans || [],
+            sentContext
           );
         }
       } catch (err) {
@@ -558,19 +603,20 @@
 
         removeTyping();
 
-        if (!res.ok) throw new Error(`Server error: ${res.status}`);
+        if (!res.ok) throw new Error(await serverErrorMessage(res));
         data = await res.json();
 
         const wrapper = addMessage(data.summary || "Summary generated.", "ai", []);
 
         if (data.doc_url) {
-          const docsLink = document.createElement("a");
-          docsLink.href   = data.doc_url;
-          docsLink.target = "_blank";
-          docsLink.rel    = "noopener noreferrer";
-          docsLink.className = "__gdocs_link__";
-          docsLink.innerHTML = `<span>📄</span> Open in Google Docs`;
-          wrapper.appendChild(docsLink);
+          wrapper.appendChild(buildDocsLink(data.doc_url));
+        } else if (data.export_id) {
+          // Doc is created in the background — poll until it's ready
+          const pendingEl = document.createElement("span");
+          pendingEl.className = "__gdocs_link__";
+          pendingEl.innerHTML = `<span>⏳</span> Saving to Google Docs…`;
+          wrapper.appendChild(pendingEl);
+          pollDocExport(data.export_id, pendingEl);
         }
       } catch (err) {
         removeTyping();
@@ -582,6 +628,45 @@
       gdocsBtn.querySelector(".__drawer_label__").textContent = "Save to Google Docs";
     });
 
+    function buildDocsLink(url) {
+      const docsLink = document.createElement("a");
+      docsLink.href   = url;
+      docsLink.target = "_blank";
+      docsLink.rel    = "noopener noreferrer";
+      docsLink.className = "__gdocs_link__";
+      docsLink.innerHTML = `<span>📄</span> Open in Google Docs`;
+      return docsLink;
+    }
+
+    async function pollDocExport(exportId, pendingEl, attempt = 0) {
+      try {
+        const res  = await fetch(`http://localhost:8090/gdocs-export/${exportId}`);
+        const data = await res.json();
+        if (data.status === "done" && data.doc_url) {
+          pendingEl.replaceWith(buildDocsLink(data.doc_url));
+          return;
+        }
+        if (data.status === "failed" || data.status === "unknown") {
+          showDocExportProblem(pendingEl, `Google Docs export failed: ${data.error || data.status}`);
+          return;
+        }
+      } catch (e) {
+        // Backend hiccup — keep polling
+      }
+      if (attempt >= 60) {
+        showDocExportProblem(pendingEl, "Google Docs export is taking too long");
+        return;
+      }
+      setTimeout(() => pollDocExport(exportId, pendingEl, attempt + 1), 1500);
+    }
+
+    // The message can carry server error text, so it goes in as text, never HTML
+    function showDocExportProblem(pendingEl, message) {
+      const icon = document.createElement("span");
+      icon.textContent = "⚠️";
+      pendingEl.replaceChildren(icon, ` ${message}`);
+    }
+
     // ── Feature 3: Resize Handle ─────────────────────────────────
     let isResizing = false;
     let resizeStartX, resizeStartY, resizeStartW, resizeStartH;
@@ -38,6 +38,7 @@ window.__Highlighter__ = (function () {
       parent.replaceChild(document.createTextNode(el.textContent), el);
       parent.normalize();
     });
+    refreshTouched();
   }
 
   // ── Find & highlight text using TreeWalker ────────────────────
@@ -87,37 +88,211 @@ window.__Highlighter__ = (function () {
     return [cleaned, ...sentences, ...windows];
   }
 
+  // ── TreeWalker over page text, skipping scripts and our own UI ─
+  function textWalker(minLength) {
+    return document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+      acceptNode(node) {
+        // Skip script/style/our own extension UI
+        const parent = node.parentElement;
+        if (!parent) return NodeFilter.FILTER_REJECT;
+        const tag = parent.tagName?.toLowerCase();
+        if (
+          ["script", "style", "noscript", "textarea", "input"].includes(tag)
+        ) {
+          return NodeFilter.FILTER_REJECT;
+        }
+        if (
+          parent.closest("#__web_chat_ai_root__") ||
+          parent.closest("#__price_panel__") ||
+          parent.closest("#__web_chat_ai_bubble__")
+        ) {
+          return NodeFilter.FILTER_REJECT;
+        }
+        if (node.textContent.trim().length < minLength) return NodeFilter.FILTER_SKIP;
+        return NodeFilter.FILTER_ACCEPT;
+      },
+    });
+  }
+
+  // ── Highlight an exact region of the extracted page text ─────
+  // `regionText` is context.slice(start, end) for a span returned by
+  // /chat. The extracted context and the live DOM differ only in
+  // whitespace (innerText inserts line breaks between blocks), so both
+  // sides are compared with whitespace removed: one indexOf over the
+  // page index (built when the page text is extracted), then the match
+  // is mapped to text nodes by binary search and wrapped node by node.
+  let pageIndex = null;   // { flat, nodes, starts } — see buildIndex()
+  let touched = null;     // [first, last] node indices wrapped by the last highlight
+
+  function highlightRegion(regionText) {
+    injectStyles();
+    clearHighlights();
+
+    const needle = stripSpace(regionText).toLowerCase();
+    if (needle.length < 15) return false;
+
+    if (!pageIndex) pageIndex = buildIndex();
+    let match = locate(pageIndex, needle);
+    if (!match) {
+      // Page changed since the index was built: rebuild once and retry
+      pageIndex = buildIndex();
+      match = locate(pageIndex, needle);
+      if (!match) return false;
+    }
+
+    const [start, stop] = match;
+    const { nodes, starts } = pageIndex;
+    const first = nodeAt(starts, start);
+    const last = nodeAt(starts, stop - 1);
+    const marks = [];
+    // Back to front, so wrapping one node never moves offsets still to be wrapped
+    for (let n = last; n >= first; n--) {
+      const node = nodes[n];
+      const from = n === first ? rawOffset(node.data, start - starts[n]) : 0;
+      const to = n === last ? rawOffset(node.data, stop - 1 - starts[n]) + 1 : node.data.length;
+      const mark = wrapRange(node, from, to);
+      if (mark) marks.unshift(mark);
+    }
+    touched = [first, last];
+    if (!marks.length) return false;
+
+    const firstMark = marks[0];
+    firstMark.classList.add(ACTIVE_CLASS, "__ai_highlight_pulse__");
+    firstMark.scrollIntoView({ behavior: "smooth", block: "center" });
+    setTimeout(() => firstMark.classList.remove("__ai_highlight_pulse__"), 700);
+    return true;
+  }
+
+  // [start, stop) of the needle in the index, checking the nodes it maps to
+  // are still in the page with the text they were indexed with
+  function locate(index, needle) {
+    let start = index.flat.indexOf(needle);
+    let length = needle.length;
+    if (start === -1) {
+      // Page changed since extraction: settle for the opening of the region
+      length = Math.min(needle.length, 80);
+      start = index.flat.indexOf(needle.slice(0, length));
+      if (start === -1) return null;
+    }
+    const first = nodeAt(index.starts, start);
+    const last = nodeAt(index.starts, start + length - 1);
+    for (let n = first; n <= last; n++) {
+      const node = index.nodes[n];
+      if (!node.isConnected || stripSpace(node.data).length !== index.starts[n + 1] - index.starts[n]) {
+        return null;
+      }
+    }
+    return [start, start + length];
+  }
+
+  // Page text with whitespace removed, lowercased. nodes[i]'s text starts at
+  // flat offset starts[i]; starts has one extra entry for the end.
+  function buildIndex() {
+    const walker = textWalker(1);
+    const parts = [];
+    const nodes = [];
+    const starts = [0];
+    let node;
+    while ((node = walker.nextNode())) {
+      const text = foldText(node.data);
+      parts.push(text);
+      nodes.push(node);
+      starts.push(starts[starts.length - 1] + text.length);
+    }
+    return { flat: parts.join(""), nodes, starts };
+  }
+
+  // After highlights are unwrapped and merged back, re-walk only the nodes
+  // between the neighbours of the ones that were wrapped
+  function refreshTouched() {
+    if (!pageIndex || !touched) return;
+    const [first, last] = touched;
+    touched = null;
+    const { nodes, starts } = pageIndex;
+    const before = nodes[first - 1];
+    const after = nodes[last + 1];
+    if ((before && !before.isConnected) || (after && !after.isConnected)) {
+      pageIndex = null;
+      return;
+    }
+    const walker = textWalker(1);
+    if (before) walker.currentNode = before;
+    const fresh = [];
+    const lengths = [];
+    let node;
+    while ((node = walker.nextNode()) && node !== after) {
+      fresh.push(node);
+      lengths.push(foldText(node.data).length);
+    }
+    const total = lengths.reduce((a, b) => a + b, 0);
+    if (total !== starts[last + 1] - starts[first]) {
+      pageIndex = null;   // text changed underneath; rebuild on next use
+      return;
+    }
+    const freshStarts = [];
+    let at = starts[first];
+    for (const length of lengths) {
+      freshStarts.push(at);
+      at += length;
+    }
+    nodes.splice(first, last - first + 1, ...fresh);
+    starts.splice(first, last - first + 1, ...freshStarts);
+  }
+
+  // Largest i with starts[i] <= pos
+  function nodeAt(starts, pos) {
+    let lo = 0;
+    let hi = starts.length - 2;
+    while (lo < hi) {
+      const mid = (lo + hi + 1) >> 1;
+      if (starts[mid] <= pos) lo = mid;
+      else hi = mid - 1;
+    }
+    return lo;
+  }
+
+  // Offset in `text` of its k-th non-whitespace character
+  function rawOffset(text, k) {
+    const re = /\S/g;
+    let m;
+    while ((m = re.exec(text))) {
+      if (k-- === 0) return m.index;
+    }
+    return text.length;
+  }
+
+  function stripSpace(text) {
+    return text.replace(/\s+/g, "");
+  }
+
+  // Lowercasing can change the length of a few characters (e.g. "İ"); keep
+  // those nodes as-is so offsets stay one per non-whitespace character
+  function foldText(text) {
+    const stripped = stripSpace(text);
+    const lower = stripped.toLowerCase();
+    return lower.length === stripped.length ? lower : stripped;
+  }
+
+  function wrapRange(node, from, to) {
+    try {
+      const range = document.createRange();
+      range.setStart(node, from);
+      range.setEnd(node, to);
+      const mark = document.createElement("mark");
+      mark.className = HIGHLIGHT_CLASS;
+      range.surroundContents(mark);
+      return mark;
+    } catch (e) {
+      return null;
+    }
+  }
+
   // ── Walk DOM text nodes and wrap matching text ────────────────
   function findAndWrap(phrase) {
     const normalizedPhrase = normalizeStr(phrase);
     if (normalizedPhrase.length < 15) return null;
 
-    const walker = document.createTreeWalker(
-      document.body,
-      NodeFilter.SHOW_TEXT,
-      {
-        acceptNode(node) {
-          // Skip script/style/our own extension UI
-          const parent = node.parentElement;
-          if (!parent) return NodeFilter.FILTER_REJECT;
-          const tag = parent.tagName?.toLowerCase();
-          if (
-            ["script", "style", "noscript", "textarea", "input"].includes(tag)
-          ) {
-            return NodeFilter.FILTER_REJECT;
-          }
-          if (
-            parent.closest("#__web_chat_ai_root__") ||
-            parent.closest("#__price_panel__") ||
-            parent.closest("#__web_chat_ai_bubble__")
-          ) {
-            return NodeFilter.FILTER_REJECT;
-          }
-          if (node.textContent.trim().length < 5) return NodeFilter.FILTER_SKIP;
-          return NodeFilter.FILTER_ACCEPT;
-        },
-      }
-    );
+    const walker = textWalker(5);
 
     let node;
     while ((node = walker.nextNode())) {
@@ -158,6 +333,14 @@ window.__Highlighter__ = (function () {
     highlight(sourceText) {
       return highlightText(sourceText);
     },
+    highlightRegion(regionText) {
+      return highlightRegion(regionText);
+    },
+    // Called when the page text is (re-)extracted, so clicks don't walk the DOM
+    reindex() {
+      pageIndex = buildIndex();
+      touched = null;
+    },
     clear() {
       clearHighlights();
     },
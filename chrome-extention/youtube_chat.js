@@ -86,6 +86,13 @@ window.__YouTubeChat__ = (function () {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ video_id: currentVideoId, message }),
       });
+      if (res.status === 429) {
+        const retry = res.headers.get("Retry-After");
+        return {
+          answer: `The AI is busy right now. Try again${retry ? ` in ${retry}s` : " shortly"}.`,
+          timelines: [],
+        };
+      }
       return await res.json();
     }
   